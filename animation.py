@@ -0,0 +1,76 @@
+"""
+Keyframe-Animation von Kartenpunkten, abgespielt im Browser.
+
+Alle Zwischenpositionen werden einmal mit NumPy berechnet (Start -> Ziel, mit Easing) und als
+ein Paket an die Karten-Komponente (livemap.py) geschickt. Der Browser spielt die Frames mit
+fester Bildrate ab und zeichnet verblassende Spuren, der Server macht währenddessen nichts.
+"""
+
+import hashlib
+import json
+
+import numpy as np
+
+FPS = 30
+DURATION = 1.0
+TRAIL = 10
+DEFAULT_COLOR = '#3186cc'
+DEFAULT_RADIUS = 5
+
+EASINGS = {
+    "linear": lambda t: t,
+    "ease_in": lambda t: t ** 3,
+    "ease_out": lambda t: 1 - (1 - t) ** 3,
+    "ease_in_out": lambda t: np.where(t < 0.5, 4 * t ** 3, 1 - (-2 * t + 2) ** 3 / 2),
+}
+
+
+def keyframes(start, goal, n_frames, easing="ease_in_out"):
+    """
+    Positions of all points for every frame.
+
+    Args:
+        start (array-like): (points x 2) start coordinates [lat, lon]
+        goal (array-like): (points x 2) goal coordinates
+        n_frames (int): Number of frames, the first one is the start, the last one the goal
+        easing (str): Name in EASINGS
+
+    Returns:
+        np.ndarray: (frames x points x 2)
+    """
+    start = np.asarray(start, dtype=float).reshape(-1, 2)
+    goal = np.asarray(goal, dtype=float).reshape(-1, 2)
+    t = EASINGS[easing](np.linspace(0, 1, n_frames))
+    return start[None, :, :] + np.asarray(t)[:, None, None] * (goal - start)[None, :, :]
+
+
+def animation_payload(start, goal, fps=FPS, duration=DURATION, easing="ease_in_out", trail=TRAIL,
+                      color=DEFAULT_COLOR, radius=DEFAULT_RADIUS, precision=5):
+    """
+    Animation for livemap.live_map(animation=...): frames as flat [lat, lon, lat, lon, ...] rows.
+
+    Args:
+        start (array-like): (points x 2) start coordinates [lat, lon]
+        goal (array-like): (points x 2) goal coordinates
+        fps (int): Frames per second in the browser
+        duration (float): Length in seconds
+        easing (str): Name in EASINGS
+        trail (int): Number of frames a trail dot stays visible while fading out
+        color (str): Marker color
+        radius (float): Marker radius in pixels
+        precision (int): Decimal places of the coordinates (5 ~ 1 m)
+
+    Returns:
+        dict: frames, final positions, playback settings and a content version
+    """
+    frames = np.round(keyframes(start, goal, max(2, int(round(fps * duration)) + 1), easing), precision)
+    payload = {
+        "frames": frames.reshape(len(frames), -1).tolist(),
+        "final": frames[-1].tolist() if len(frames) else [],
+        "fps": fps,
+        "trail": trail,
+        "color": color,
+        "radius": radius
+    }
+    payload["version"] = hashlib.sha1(json.dumps(payload, separators=(",", ":")).encode()).hexdigest()[:16]
+    return payload
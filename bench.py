@@ -0,0 +1,230 @@
+"""
+Benchmark der Dashboard-Stufen mit synthetischen Daten.
+
+Erzeugt deterministische Dateien im Format von bern_23_clean.csv, standorte.csv und
+zurich_mobility.csv in wählbarer Grösse und misst pro Stufe Laufzeit und Spitzenspeicher.
+
+Beispiel:
+    python bench.py --years 1 5 --stations 10 500 --freq 1h
+"""
+
+import argparse
+import gc
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import k6
+from rollup import traffic_cube
+from timeindex import window_end
+
+WEATHER_TYPES = [
+    ('01d', 'Clear', 'clear sky'), ('02d', 'Clouds', 'few clouds'), ('03d', 'Clouds', 'scattered clouds'),
+    ('04n', 'Clouds', 'overcast clouds'), ('10d', 'Rain', 'light rain'), ('13d', 'Snow', 'light snow'),
+    ('50d', 'Mist', 'mist')
+]
+CITY_CENTER_LV95 = (2683000, 1248000)
+
+
+def generate_weather(path, years=1, start_year=2023, seed=0):
+    """
+    Hourly weather rows shaped like the OpenWeather exports (bern_23_clean.csv).
+    """
+    rng = np.random.default_rng(seed)
+    start = int(datetime(start_year, 1, 1).timestamp()) // 3600 * 3600
+    dt = start + np.arange(int(years * 365 * 24)) * 3600
+    n = len(dt)
+    day_of_year = (dt // 86400) % 365
+    temp = 9 - 10 * np.cos(2 * np.pi * day_of_year / 365) + rng.normal(0, 3, n)
+    weather = rng.integers(0, len(WEATHER_TYPES), n)
+    icons, mains, descriptions = (np.array(col)[weather] for col in zip(*WEATHER_TYPES))
+    df = pd.DataFrame({
+        'dt': dt,
+        'dt_iso': pd.to_datetime(dt, unit='s').strftime('%Y-%m-%d %H:%M:%S +0000 UTC'),
+        'timezone': 3600,
+        'city_name': 'Bern',
+        'temp': temp.round(2),
+        'visibility': 10000,
+        'dew_point': (temp - rng.uniform(1, 8, n)).round(2),
+        'feels_like': (temp - rng.uniform(0, 3, n)).round(2),
+        'temp_min': (temp - 1).round(2),
+        'temp_max': (temp + 1).round(2),
+        'pressure': rng.integers(990, 1035, n),
+        'humidity': rng.integers(35, 100, n),
+        'wind_speed': rng.gamma(2, 1.2, n).round(2),
+        'wind_deg': rng.integers(0, 360, n),
+        'wind_gust': rng.gamma(2, 2, n).round(2),
+        'rain_1h': np.where(mains == 'Rain', rng.gamma(1, 0.5, n).round(2), np.nan),
+        'clouds_all': rng.integers(0, 101, n),
+        'weather_id': 800,
+        'weather_main': mains,
+        'weather_description': descriptions,
+        'weather_icon': icons
+    })
+    df.to_csv(path, index=False)
+    return path
+
+
+def generate_stations(path, n_stations=100, seed=0):
+    """
+    Counting stations shaped like standorte.csv (WKT points in LV95).
+    """
+    rng = np.random.default_rng(seed)
+    easting = CITY_CENTER_LV95[0] + rng.normal(0, 2500, n_stations)
+    northing = CITY_CENTER_LV95[1] + rng.normal(0, 2000, n_stations)
+    df = pd.DataFrame({
+        'abkuerzung': np.where(rng.random(n_stations) < 0.5, 'VZS', 'FZS'),
+        'bezeichnung': [f'Zählstelle {i}' for i in range(n_stations)],
+        'fk_zaehler': np.arange(1, n_stations + 1),
+        'geometry': [f'POINT ({e:.1f} {n:.1f})' for e, n in zip(easting, northing)]
+    })
+    df.to_csv(path, index=False)
+    return path
+
+
+def generate_counts(path, stations_path, years=1, start_year=2023, freq='15min', seed=0, chunk_days=30):
+    """
+    Count rows shaped like zurich_mobility.csv, one row per station and interval.
+
+    Written in chunks of chunk_days, so large scales don't need the whole table in memory.
+    """
+    rng = np.random.default_rng(seed)
+    stations = pd.read_csv(stations_path)
+    coords = stations['geometry'].str.extract(r'POINT \((\S+) (\S+)\)').astype(float).to_numpy()
+    ids = stations['fk_zaehler'].to_numpy()
+    is_velo = (stations['abkuerzung'] == 'VZS').to_numpy()
+    level = rng.gamma(2, 5, len(ids))
+
+    start = pd.Timestamp(datetime(start_year, 1, 1))
+    end = start + pd.DateOffset(days=int(years * 365))
+    header = True
+    chunk_start = start
+    while chunk_start < end:
+        chunk_end = min(chunk_start + pd.Timedelta(days=chunk_days), end)
+        times = pd.date_range(chunk_start, chunk_end, freq=freq, inclusive='left')
+        hour = np.repeat(times.hour.to_numpy(), len(ids))
+        profile = 0.3 + np.exp(-((hour - 8) ** 2) / 8) + np.exp(-((hour - 17) ** 2) / 8)
+        mean = np.tile(level, len(times)) * profile
+        velo = np.tile(is_velo, len(times))
+        counts = {col: rng.poisson(mean).astype(float) for col in ['IN_A', 'OUT_A']}
+        df = pd.DataFrame({
+            'FK_STANDORT': np.tile(ids, len(times)),
+            'DATUM': np.repeat(times.strftime('%Y-%m-%dT%H:%M'), len(ids)),
+            'VELO_IN': np.where(velo, counts['IN_A'], np.nan),
+            'VELO_OUT': np.where(velo, counts['OUT_A'], np.nan),
+            'FUSS_IN': np.where(velo, np.nan, counts['IN_A']),
+            'FUSS_OUT': np.where(velo, np.nan, counts['OUT_A']),
+            'OST': np.tile(coords[:, 0], len(times)),
+            'NORD': np.tile(coords[:, 1], len(times))
+        })
+        df.to_csv(path, mode='w' if header else 'a', header=header, index=False)
+        header = False
+        chunk_start = chunk_end
+    return path
+
+
+def measure(stage, func, *args, **kwargs):
+    """
+    Runs func once and returns (result, record) with wall time and peak traced memory.
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, {'stage': stage, 'seconds': round(elapsed, 4), 'peak_mb': round(peak / 2 ** 20, 2)}
+
+
+def key_statistics(counts_df, start_timestamp, duration, unit):
+    # Fenstersummen wie in k6.main, danach das Panel selbst
+    totals = traffic_cube(counts_df).totals(start_timestamp, window_end(start_timestamp, duration, unit))
+    return k6.key_statistics(totals, [counts_df], start_timestamp, duration, unit)
+
+
+def run_scale(work_dir, years, n_stations, freq, windows, seed=0):
+    """
+    Generates one data set and benchmarks all stages on it.
+
+    Returns:
+        list: One record per stage
+    """
+    weather_path = os.path.join(work_dir, 'bern_23_clean.csv')
+    stations_path = os.path.join(work_dir, 'standorte.csv')
+    counts_path = os.path.join(work_dir, 'zurich_mobility.csv')
+    generate_weather(weather_path, years, seed=seed)
+    generate_stations(stations_path, n_stations, seed=seed)
+    generate_counts(counts_path, stations_path, years, freq=freq, seed=seed)
+    st.cache_resource.clear()
+
+    records = []
+    wetter, record = measure('load_weather_data (cold)', k6.load_weather_data, weather_path, weather_path)
+    records.append(record)
+    _, record = measure('load_weather_data (warm)', k6.load_weather_data, weather_path, weather_path)
+    records.append(record)
+    points_df, record = measure('load stations (cold)', k6.load_mobility_data, stations_path, k6.load_stations)
+    records.append(record)
+    counts_df, record = measure('load counts (cold)', k6.load_mobility_data, counts_path, k6.load_counts)
+    records.append(record)
+    _, record = measure('load counts (warm)', k6.load_mobility_data, counts_path, k6.load_counts)
+    records.append(record)
+
+    start_timestamp = int(wetter['dt'].iloc[0]) + 3600
+    for duration, unit in windows:
+        label = f'{duration} {unit}'
+        filtered, record = measure(f'filter_weather_data [{label}]', k6.filter_weather_data,
+                                   wetter, start_timestamp, duration, unit)
+        records.append(record)
+        _, record = measure(f'get_representative_weather [{label}]', k6.get_representative_weather,
+                            filtered, duration, unit)
+        records.append(record)
+        _, record = measure(f'process_traffic_data [{label}]', k6.process_traffic_data,
+                            points_df, counts_df, start_timestamp, duration, unit)
+        records.append(record)
+        _, record = measure(f'key statistics [{label}]', key_statistics, counts_df, start_timestamp, duration, unit)
+        records.append(record)
+
+    rows = len(counts_df)
+    for record in records:
+        record.update({'years': years, 'stations': n_stations, 'count_rows': rows})
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark der Dashboard-Stufen mit synthetischen Daten")
+    parser.add_argument('--years', type=float, nargs='+', default=[1])
+    parser.add_argument('--stations', type=int, nargs='+', default=[10, 100])
+    parser.add_argument('--freq', default='15min', help="Zählintervall, z.B. 15min oder 1h")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--keep', help="Verzeichnis für die erzeugten Dateien (sonst temporär)")
+    parser.add_argument('--csv', help="Resultate zusätzlich als CSV speichern")
+    args = parser.parse_args()
+
+    windows = [(12, "Hours"), (10, "Days"), (12, "Months")]
+    records = []
+    for years in args.years:
+        for n_stations in args.stations:
+            work_dir = args.keep or tempfile.mkdtemp(prefix='davis_bench_')
+            os.makedirs(work_dir, exist_ok=True)
+            try:
+                records.extend(run_scale(work_dir, years, n_stations, args.freq, windows, seed=args.seed))
+            finally:
+                if not args.keep:
+                    shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = pd.DataFrame(records)[['years', 'stations', 'count_rows', 'stage', 'seconds', 'peak_mb']]
+    print(results.to_string(index=False))
+    if args.csv:
+        results.to_csv(args.csv, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+Grenzen-Speicher für die swissBOUNDARIES3D-Shapefiles.
+
+Jedes Shapefile (Kantone, Bezirke, Gemeinden) wird einmal nach GeoParquet konvertiert:
+räumlich sortiert (Kanton, dann Hilbert-Kurve), mit bbox-Spalten und kleinen Row-Groups.
+Beim Laden nach Kanton, Namen oder Ausschnitt liest pyarrow nur die passenden Row-Groups,
+statt mit gpd.read_file die ganze Schweiz zu parsen.
+
+Liegen die Shapefiles nur als Zip vor (karte/karte.zip), wird direkt aus dem Archiv gelesen
+(zip://...!datei.shp) und der Speicher über den Inhalts-Hash des Archivs aktuell gehalten.
+
+Für Webkarten gibt es pro Zoomstufe eine vereinfachte Kopie (Coverage-Vereinfachung:
+gemeinsame Grenzen zweier Nachbarn bleiben identisch, es entstehen keine Lücken).
+"""
+
+import json
+import math
+import os
+import zipfile
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from shapely.geometry import box
+
+from fileutil import file_hash
+
+BOUNDARY_DIR_ENV = "DAVIS_BOUNDARY_DIR"
+DEFAULT_BOUNDARY_DIR = "karte"
+LAYERS = {
+    "kantone": "swissBOUNDARIES3D_1_5_TLM_KANTONSGEBIET",
+    "bezirke": "swissBOUNDARIES3D_1_5_TLM_BEZIRKSGEBIET",
+    "gemeinden": "swissBOUNDARIES3D_1_5_TLM_HOHEITSGEBIET"
+}
+STORE_SUFFIX = ".parquet"
+ROW_GROUP_SIZE = 64
+# Zoomstufen mit vereinfachter Kopie, Toleranz ca. ein Pixel der jeweiligen Stufe
+ZOOM_LEVELS = (8, 10, 12, 14)
+SIMPLIFY_PIXELS = 1.0
+ARCHIVE_META_SUFFIX = ".source.json"
+# Stabile Zeilennummer im Speicher, gleich in allen vereinfachten Kopien
+ROW_COLUMN = "_row"
+# Begleitdateien, deren Änderung den Speicher ungültig macht
+_SOURCE_SUFFIXES = (".shp", ".dbf", ".shx", ".prj", ".cpg")
+
+
+def boundary_dir(directory=None):
+    return directory or os.environ.get(BOUNDARY_DIR_ENV, DEFAULT_BOUNDARY_DIR)
+
+
+def layer_paths(layer, directory=None):
+    """
+    (shapefile, GeoParquet store) of a layer name ("kantone", "bezirke", "gemeinden") or a .shp path.
+    """
+    if layer.endswith(".shp"):
+        stem = layer[:-len(".shp")]
+    else:
+        stem = os.path.join(boundary_dir(directory), LAYERS.get(layer, layer))
+    return f"{stem}.shp", f"{stem}{STORE_SUFFIX}"
+
+
+def store_is_current(shp_path, store_path):
+    """
+    True if the store exists and is newer than all files of the shapefile (like make).
+    """
+    if not os.path.exists(store_path):
+        return False
+    if not os.path.exists(shp_path):
+        # nur der Speicher wurde mitgeliefert
+        return True
+    stem = shp_path[:-len(".shp")]
+    source_mtime = max(os.stat(stem + suffix).st_mtime_ns
+                       for suffix in _SOURCE_SUFFIXES if os.path.exists(stem + suffix))
+    return os.stat(store_path).st_mtime_ns >= source_mtime
+
+
+def build_store(shp_path, store_path, row_group_size=ROW_GROUP_SIZE):
+    """
+    Converts one shapefile to GeoParquet, sorted so that row groups are spatially compact.
+    """
+    gdf = gpd.read_file(shp_path)
+    # Zeitstempel-Spalten wie in karte3 als Text, damit GeoJSON/Parquet sie ohne Umwege schreiben
+    for col in gdf.columns:
+        if pd.api.types.is_datetime64_any_dtype(gdf[col]):
+            gdf[col] = gdf[col].astype(str)
+    order = pd.DataFrame({"hilbert": gdf.geometry.hilbert_distance()})
+    sort_columns = ["hilbert"]
+    if "KANTONSNUM" in gdf.columns:
+        order["KANTONSNUM"] = gdf["KANTONSNUM"].to_numpy()
+        sort_columns = ["KANTONSNUM", "hilbert"]
+    gdf = gdf.iloc[order.sort_values(sort_columns, kind="stable").index].reset_index(drop=True)
+    gdf[ROW_COLUMN] = np.arange(len(gdf), dtype=np.int64)
+
+    tmp_path = f"{store_path}.tmp"
+    gdf.to_parquet(tmp_path, index=False, write_covering_bbox=True, row_group_size=row_group_size)
+    os.replace(tmp_path, store_path)
+    return store_path
+
+
+def _ensure_row_column(store_path):
+    # Speicher aus früheren Versionen ohne Zeilennummer einmal nachführen (Reihenfolge bleibt)
+    import pyarrow.parquet as pq
+    if ROW_COLUMN in pq.read_schema(store_path).names:
+        return
+    gdf = gpd.read_parquet(store_path).drop(columns=["bbox"], errors="ignore")
+    gdf[ROW_COLUMN] = np.arange(len(gdf), dtype=np.int64)
+    tmp_path = f"{store_path}.tmp"
+    gdf.to_parquet(tmp_path, index=False, write_covering_bbox=True, row_group_size=ROW_GROUP_SIZE)
+    os.replace(tmp_path, store_path)
+
+
+def archive_member(zip_path, member=None):
+    """
+    Name of a .shp file inside a zip archive: `member` (file name or layer name) or the first one.
+    """
+    with zipfile.ZipFile(zip_path) as archive:
+        names = [name for name in archive.namelist() if name.lower().endswith(".shp")]
+    if member is not None:
+        wanted = LAYERS.get(member, member)
+        names = [name for name in names if os.path.splitext(os.path.basename(name))[0] == wanted
+                 or os.path.basename(name) == wanted]
+    if not names:
+        raise FileNotFoundError(f"No shapefile {member or ''} in {zip_path}")
+    return names[0]
+
+
+def _archive_source(zip_path, meta_path):
+    """
+    Content hash of an archive, re-read only if its size or mtime differ from the last build.
+    """
+    stat = os.stat(zip_path)
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        meta = {}
+    if meta.get("size") == stat.st_size and meta.get("mtime_ns") == stat.st_mtime_ns:
+        return meta
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha1": file_hash(zip_path)}
+
+
+def ensure_archive_store(zip_path, member=None):
+    """
+    Store of a shapefile inside a zip archive, built from the archive without extracting it.
+
+    The store lies next to the archive (same name as the shapefile) and is rebuilt only when the
+    content hash of the archive changes, a touched but identical archive is not read again.
+    """
+    member = archive_member(zip_path, member)
+    stem = os.path.splitext(os.path.basename(member))[0]
+    store_path = os.path.join(os.path.dirname(zip_path), f"{stem}{STORE_SUFFIX}")
+    meta_path = f"{store_path}{ARCHIVE_META_SUFFIX}"
+    source = _archive_source(zip_path, meta_path)
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            built = json.load(f)
+    except (OSError, ValueError):
+        built = {}
+    if not os.path.exists(store_path) or built.get("sha1") != source["sha1"] or built.get("member") != member:
+        build_store(f"zip://{os.path.abspath(zip_path)}!{member}", store_path)
+    if built != dict(source, member=member):
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(dict(source, member=member), f)
+    _ensure_row_column(store_path)
+    return store_path
+
+
+def ensure_store(layer, directory=None):
+    """
+    Path of the GeoParquet store of a layer, (re)built from the shapefile if missing or outdated.
+
+    `layer` can also be a zip archive, "karte/karte.zip" or "karte/karte.zip!gemeinden".
+    """
+    zip_path, _, member = layer.partition("!")
+    if zip_path.lower().endswith(".zip"):
+        return ensure_archive_store(zip_path, member or None)
+    shp_path, store_path = layer_paths(layer, directory)
+    if not store_is_current(shp_path, store_path):
+        if not os.path.exists(shp_path):
+            raise FileNotFoundError(f"Neither {store_path} nor {shp_path} found")
+        build_store(shp_path, store_path)
+    _ensure_row_column(store_path)
+    return store_path
+
+
+def load_boundaries(layer, cantons=None, names=None, bbox=None, columns=None, rows=None, directory=None):
+    """
+    Loads boundaries from the store, reading only the row groups that can match.
+
+    Args:
+        layer (str): "kantone", "bezirke", "gemeinden", a path to a .shp file or a .zip archive
+        cantons (list): Optional canton numbers (KANTONSNUM), e.g. [2] for Bern
+        names (list): Optional NAME values
+        bbox (tuple): Optional (xmin, ymin, xmax, ymax) in LV95, keeps geometries intersecting it
+        columns (list): Optional attribute columns (geometry and _row are always loaded)
+        rows (list): Optional _row ids, the stable row numbers of the store
+        directory (str): Folder with the shapefiles, default $DAVIS_BOUNDARY_DIR or "karte"
+
+    Returns:
+        gpd.GeoDataFrame: Matching boundaries in LV95 (EPSG:2056)
+    """
+    return _read_store(ensure_store(layer, directory), cantons, names, bbox, columns, rows)
+
+
+def _read_store(store_path, cantons=None, names=None, bbox=None, columns=None, rows=None):
+    filters = []
+    if cantons is not None:
+        filters.append(("KANTONSNUM", "in", [float(canton) for canton in cantons]))
+    if names is not None:
+        filters.append(("NAME", "in", list(names)))
+    if rows is not None:
+        filters.append((ROW_COLUMN, "in", [int(row) for row in rows]))
+    if columns is not None:
+        columns = list(dict.fromkeys(list(columns) + [ROW_COLUMN, "geometry"]))
+    gdf = gpd.read_parquet(store_path, columns=columns, bbox=bbox, filters=filters or None)
+    gdf = gdf.drop(columns=["bbox"], errors="ignore")
+    if bbox is not None and len(gdf):
+        # Row-Groups/bbox-Spalten liefern Kandidaten, der räumliche Index die genaue Auswahl
+        hits = gdf.sindex.query(box(*bbox), predicate="intersects")
+        gdf = gdf.iloc[sorted(hits)]
+    return gdf
+
+
+def tolerance_for_zoom(zoom, latitude=46.8, pixels=SIMPLIFY_PIXELS):
+    """
+    Web-Mercator ground resolution in metres for `pixels` screen pixels at a zoom level.
+    """
+    return pixels * 156543.03392 * math.cos(math.radians(latitude)) / 2 ** zoom
+
+
+def level_for_zoom(zoom, levels=ZOOM_LEVELS):
+    """
+    Precomputed level for a map zoom: the coarsest level that is at least as detailed.
+    """
+    finer = [level for level in levels if level >= zoom]
+    return min(finer) if finer else max(levels)
+
+
+def simplified_path(store_path, level):
+    return f"{store_path[:-len(STORE_SUFFIX)]}.z{level}{STORE_SUFFIX}"
+
+
+def simplify_coverage(geometries, tolerance):
+    """
+    Simplifies polygons that tile an area without moving shared borders apart.
+
+    Falls back to per-polygon topology-preserving simplification if the input is not a
+    valid coverage (overlaps), then neighbours may no longer match exactly.
+    """
+    geometries = shapely.force_2d(np.asarray(geometries))
+    if shapely.coverage_is_valid(geometries):
+        return shapely.coverage_simplify(geometries, tolerance, simplify_boundary=True)
+    return shapely.simplify(geometries, tolerance, preserve_topology=True)
+
+
+def build_simplified(store_path, levels=ZOOM_LEVELS):
+    """
+    Writes one simplified copy of a store per zoom level (same sort order and row groups).
+    """
+    gdf = gpd.read_parquet(store_path).drop(columns=["bbox"], errors="ignore")
+    latitude = gdf.to_crs(epsg=4326).total_bounds[[1, 3]].mean() if len(gdf) else 46.8
+    paths = []
+    for level in levels:
+        simplified = gdf.copy()
+        simplified.geometry = gpd.GeoSeries(
+            simplify_coverage(gdf.geometry.values, tolerance_for_zoom(level, latitude)), crs=gdf.crs)
+        path = simplified_path(store_path, level)
+        tmp_path = f"{path}.tmp"
+        simplified.to_parquet(tmp_path, index=False, write_covering_bbox=True, row_group_size=ROW_GROUP_SIZE)
+        os.replace(tmp_path, path)
+        paths.append(path)
+    return paths
+
+
+def load_simplified(layer, zoom, cantons=None, names=None, bbox=None, columns=None, rows=None, directory=None):
+    """
+    Like load_boundaries, but from the simplified copy that matches a map zoom level.
+
+    The copies are built on first use and rebuilt when the store changes. They have the same
+    rows as the store, a _row id selects the same polygon in every copy.
+
+    Returns:
+        gpd.GeoDataFrame: Matching boundaries in LV95 (EPSG:2056)
+    """
+    store_path = ensure_store(layer, directory)
+    path = simplified_path(store_path, level_for_zoom(zoom))
+    if not os.path.exists(path) or os.stat(path).st_mtime_ns < os.stat(store_path).st_mtime_ns:
+        build_simplified(store_path)
+    return _read_store(path, cantons, names, bbox, columns, rows)
+
+
+def web_geometries(gdf, precision=5):
+    """
+    Reprojects boundaries to WGS84 for Leaflet and rounds the coordinates (5 decimals ~ 1 m).
+    """
+    gdf = gdf.to_crs(epsg=4326)
+    gdf.geometry = gdf.geometry.set_precision(10 ** -precision)
+    return gdf
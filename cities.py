@@ -0,0 +1,114 @@
+"""
+Städte-Register des Dashboards.
+
+Jede Stadt hat ihr Zentrum, eine Wetterquelle und beliebig viele Mobilitätsquellen.
+Die Daten jeder Quelle bleiben eine eigene Partition (ein DataFrame pro Datei, siehe datastore).
+Eine Auswahl mehrerer Städte wird als FrameUnion gelesen: die Partitionen werden nie
+zusammenkopiert, nur die Zeilen eines Zeitfensters werden zu einem kleinen Frame vereint.
+"""
+
+import numpy as np
+import pandas as pd
+
+from timeindex import time_index, window_end
+
+
+class MobilitySource:
+    """
+    One counting network of a city: station table (e.g. standorte.csv) and counts table.
+    """
+
+    def __init__(self, points_path, counts_path):
+        self.points_path = points_path
+        self.counts_path = counts_path
+
+
+class City:
+    """
+    Registry entry of a city.
+
+    Args:
+        name (str): Name shown in the controls
+        center (list): [lat, lon] of the map center
+        weather_path (str): Hourly weather CSV (OpenWeather export, 'dt' column)
+        mobility (list): MobilitySource entries, empty if there are no counts for the city
+    """
+
+    def __init__(self, name, center, weather_path, mobility=None):
+        self.name = name
+        self.center = list(center)
+        self.weather_path = weather_path
+        self.mobility = list(mobility or [])
+
+    @property
+    def has_mobility(self):
+        return bool(self.mobility)
+
+
+CITIES = {}
+
+
+def register_city(city):
+    CITIES[city.name] = city
+    return city
+
+
+# Nur Städte mit vorhandenen Dateien eintragen, sonst fehlt ihre Partition
+register_city(City("Bern", [46.9480, 7.4474], "arbeit/wetter/bern_23_clean.csv"))
+register_city(City("Zurich", [47.3769, 8.5417], "arbeit/wetter/zurich_23_clean.csv", mobility=[
+    MobilitySource("arbeit/mobility_zurich/standorte.csv", "arbeit/mobility_zurich/zurich_mobility.csv")
+]))
+
+
+def map_view(cities, width=700, height=600, padding=1.5):
+    """
+    Center and zoom for a selection of cities: the city itself, or the largest zoom that shows
+    all centers (with some padding) on a map of width x height pixels.
+    """
+    if len(cities) == 1:
+        return cities[0].center, 13
+    centers = np.array([city.center for city in cities])
+    lat, lon = centers.mean(axis=0)
+    # Web-Mercator: 256 Pixel pro 360° bei Zoom 0, Breitengrade um 1/cos(lat) gestreckt
+    lat_spread, lon_spread = np.ptp(centers, axis=0) * padding
+    lat_spread /= np.cos(np.radians(lat))
+    zoom = min(np.log2(width * 360 / (256 * max(lon_spread, 1e-6))),
+               np.log2(height * 360 / (256 * max(lat_spread, 1e-6))))
+    return [float(lat), float(lon)], int(np.clip(np.floor(zoom), 1, 13))
+
+
+class FrameUnion:
+    """
+    Several partitions with the same columns, read as one table without copying them.
+
+    Partitions that are None are skipped. Windows are cut from every partition through its
+    own cached time index, only the selected rows are combined.
+    """
+
+    def __init__(self, parts):
+        self.parts = [part for part in parts if part is not None]
+
+    def __len__(self):
+        return sum(len(part) for part in self.parts)
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    def between(self, column, start, end):
+        """
+        Rows with start <= column <= end of all partitions, sorted by column.
+
+        Equal values keep the partition order, i.e. the result is the same as cutting the
+        window from pd.concat(parts) sorted stably by column.
+        """
+        windows = [time_index(part, column).between(start, end) for part in self.parts]
+        windows = [window for window in windows if not window.empty]
+        if not windows:
+            return self.parts[0].iloc[0:0] if self.parts else pd.DataFrame()
+        if len(windows) == 1:
+            return windows[0]
+        return pd.concat(windows).sort_values(column, kind="stable")
+
+    def window(self, column, start_timestamp, duration, unit):
+        return self.between(column, start_timestamp, window_end(start_timestamp, duration, unit))
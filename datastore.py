@@ -0,0 +1,210 @@
+"""
+Datenspeicher für die CSV-Quellen des Dashboards.
+
+Jede Quelle (Wetter, Zählstellen, Zähldaten) wird nur einmal mit pd.read_csv geparst.
+Danach liegt daneben eine typisierte Parquet-Kopie, die bei späteren Starts gelesen wird.
+Innerhalb eines Streamlit-Serverprozesses teilen sich alle Sessions dasselbe Objekt.
+"""
+
+import json
+import os
+import threading
+import weakref
+
+import pandas as pd
+import streamlit as st
+
+from fileutil import file_hash
+import metrics
+from geo import add_wgs84_columns
+
+CACHE_SUFFIX = ".cache.parquet"
+_META_KEY = b"davis_source"
+
+
+def cache_path(path):
+    """
+    Path of the Parquet copy that belongs to a CSV source.
+
+    Args:
+        path (str): Path to the .csv file
+
+    Returns:
+        str: e.g. 'zurich_mobility.cache.parquet' next to 'zurich_mobility.csv'
+    """
+    root, _ = os.path.splitext(path)
+    return root + CACHE_SUFFIX
+
+
+def _read_copy_meta(copy_path):
+    # Nur das Schema lesen, nicht die Daten
+    try:
+        import pyarrow.parquet as pq
+        metadata = pq.read_schema(copy_path).metadata or {}
+        return json.loads(metadata[_META_KEY])
+    except (ImportError, OSError, KeyError, ValueError):
+        return None
+
+
+def _write_copy(df, copy_path, meta):
+    """
+    Writes the Parquet copy atomically. Without pyarrow or write access the copy is skipped,
+    the in-process cache still works.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        return False
+    tmp_path = f"{copy_path}.{os.getpid()}.tmp"
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[_META_KEY] = json.dumps(meta).encode()
+        pq.write_table(table.replace_schema_metadata(metadata), tmp_path)
+        os.replace(tmp_path, copy_path)
+        return True
+    except (OSError, pa.ArrowException):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+
+def _read_or_build(path, mtime_ns, size):
+    copy_path = cache_path(path)
+    meta = _read_copy_meta(copy_path)
+    if meta is not None and meta.get("size") == size:
+        if meta.get("mtime_ns") == mtime_ns:
+            metrics.cache_hit("parquet_copy")
+            return pd.read_parquet(copy_path)
+        # mtime geändert: nur neu parsen, wenn sich auch der Inhalt geändert hat
+        sha1 = file_hash(path)
+        if meta.get("sha1") == sha1:
+            metrics.cache_hit("parquet_copy")
+            df = pd.read_parquet(copy_path)
+            _write_copy(df, copy_path, {"mtime_ns": mtime_ns, "size": size, "sha1": sha1})
+            return df
+
+    metrics.cache_miss("parquet_copy")
+    df = pd.read_csv(path)
+    _write_copy(df, copy_path, {"mtime_ns": mtime_ns, "size": size, "sha1": file_hash(path)})
+    return df
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def _load_csv_cached(path, mtime_ns, size):
+    metrics.record_miss("csv")
+    return _read_or_build(path, mtime_ns, size)
+
+
+def load_csv(path):
+    """
+    Loads a CSV source through the columnar cache.
+
+    The returned DataFrame is shared between all sessions of the server process,
+    callers must not modify it in place.
+
+    Args:
+        path (str): Path to the .csv file
+
+    Returns:
+        pd.DataFrame: Content of the file
+    """
+    stat = os.stat(path)
+    with metrics.cache_lookup("csv"):
+        return _load_csv_cached(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def _load_stations_cached(path, mtime_ns, size):
+    metrics.record_miss("stations")
+    return add_wgs84_columns(_load_csv_cached(path, mtime_ns, size))
+
+
+def load_stations(path):
+    """
+    Loads a station table (e.g. standorte.csv) with precomputed WGS84 'lat' / 'lon' columns.
+    """
+    stat = os.stat(path)
+    with metrics.cache_lookup("stations"):
+        return _load_stations_cached(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+def normalize_counts(df):
+    """
+    Adds an int64 epoch column 'DATUM_TS' (seconds, DATUM read as UTC) to a counts table.
+
+    The conversion is vectorized and works on a copy, the original 'DATUM' column is kept.
+    """
+    datum = pd.to_datetime(df['DATUM'])
+    if datum.dt.tz is not None:
+        datum = datum.dt.tz_convert('UTC').dt.tz_localize(None)
+    ts = ((datum - pd.Timestamp(0)) // pd.Timedelta(seconds=1)).astype('int64')
+    return df.assign(DATUM_TS=ts)
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def _load_counts_cached(path, mtime_ns, size):
+    metrics.record_miss("counts")
+    return normalize_counts(_load_csv_cached(path, mtime_ns, size))
+
+
+def load_counts(path):
+    """
+    Loads a counts table (e.g. zurich_mobility.csv) with the normalized 'DATUM_TS' column.
+    """
+    stat = os.stat(path)
+    with metrics.cache_lookup("counts"):
+        return _load_counts_cached(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+_derived = {}
+_derived_lock = threading.Lock()
+
+
+def derived(df, name, build):
+    """
+    Caches an object derived from a DataFrame (index, rollup, ...) for the lifetime of that frame.
+
+    Frames shared through the data store are therefore processed once per server process.
+    build(df) must not keep a reference to df itself, otherwise the entry is never released.
+
+    Args:
+        df (pd.DataFrame): Source frame
+        name (str): Name of the derived object, e.g. 'time_index:dt'
+        build (callable): Function df -> derived object
+
+    Returns:
+        object: Cached result of build(df)
+    """
+    key = (id(df), name)
+    with _derived_lock:
+        if key in _derived:
+            metrics.cache_hit(f"derived:{name}")
+            return _derived[key]
+    metrics.cache_miss(f"derived:{name}")
+    value = build(df)
+    with _derived_lock:
+        if key not in _derived:
+            _derived[key] = value
+            weakref.finalize(df, _derived.pop, key, None)
+        return _derived[key]
+
+
+STATION_METADATA_COLUMNS = ['bezeichnung', 'abkuerzung', 'lat', 'lon']
+
+
+def _build_station_index(points_df):
+    columns = [col for col in STATION_METADATA_COLUMNS if col in points_df.columns]
+    index = points_df[columns].set_index(points_df['fk_zaehler'].astype(str).rename('standort'))
+    # wie bisher zählt der erste Eintrag pro Zähler
+    return index[~index.index.duplicated(keep='first')]
+
+
+def station_index(points_df):
+    """
+    Station metadata (name, type abbreviation, coordinates) keyed by fk_zaehler as string.
+
+    Built once per station table, so joining it to an aggregate is a single hash join.
+    """
+    return derived(points_df, 'station_index', _build_station_index)
@@ -0,0 +1,143 @@
+"""
+Dichte-Raster der Zählstellen-Verkehrssummen.
+
+Die Summen pro Zählstelle für ein Zeitfenster werden in LV95 (EPSG:2056) in ein festes
+Pixelraster summiert, optional gaussgeglättet und als ein PNG-Overlay ausgeliefert.
+Der Aufwand hängt von der Rastergrösse ab, nicht von der Anzahl Punkte.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+from folium.raster_layers import ImageOverlay
+from folium.utilities import image_to_url
+
+import metrics
+from datastore import derived
+from geo import swiss_to_wgs84_array
+from rollup import COUNT_COLUMNS, traffic_cube
+
+GRID_SHAPE = (256, 256)
+SIGMA = 2.0
+CACHE_SIZE = 32
+
+
+def station_grid(easting, northing, weights, bounds, shape=GRID_SHAPE):
+    """
+    Sums point weights into a pixel grid.
+
+    Args:
+        easting (np.ndarray): LV95 easting per point
+        northing (np.ndarray): LV95 northing per point
+        weights (np.ndarray): Value per point (e.g. total traffic)
+        bounds (tuple): (xmin, ymin, xmax, ymax) in LV95
+        shape (tuple): (rows, cols) of the grid
+
+    Returns:
+        np.ndarray: Grid with row 0 at the northern edge
+    """
+    xmin, ymin, xmax, ymax = bounds
+    valid = np.isfinite(easting) & np.isfinite(northing) & np.isfinite(weights)
+    grid, _, _ = np.histogram2d(northing[valid], easting[valid], bins=shape,
+                                range=[[ymin, ymax], [xmin, xmax]], weights=weights[valid])
+    return grid[::-1]
+
+
+def gaussian_smooth(grid, sigma=SIGMA):
+    """
+    Separable Gaussian blur with a kernel of +-3 sigma pixels (sigma <= 0 returns the grid).
+    """
+    if sigma <= 0:
+        return grid
+    radius = max(1, int(3 * sigma + 0.5))
+    x = np.arange(-radius, radius + 1)
+    kernel = np.exp(-x ** 2 / (2 * sigma ** 2))
+    kernel /= kernel.sum()
+    grid = np.apply_along_axis(np.convolve, 1, grid, kernel, mode='same')
+    return np.apply_along_axis(np.convolve, 0, grid, kernel, mode='same')
+
+
+def grid_to_rgba(grid):
+    """
+    Colors a grid from blue (low) to red (high) like the station markers, empty pixels transparent.
+    """
+    peak = grid.max()
+    norm = grid / peak if peak > 0 else np.zeros_like(grid)
+    rgba = np.zeros(grid.shape + (4,), dtype=np.uint8)
+    rgba[..., 0] = (255 * norm).astype(np.uint8)
+    rgba[..., 2] = (255 * (1 - norm)).astype(np.uint8)
+    rgba[..., 3] = np.where(norm > 0.01, 60 + 195 * norm, 0).astype(np.uint8)
+    return rgba
+
+
+def lv95_bounds_to_wgs84(bounds):
+    """
+    LV95 (xmin, ymin, xmax, ymax) -> [[south, west], [north, east]] for Leaflet.
+
+    LV95 is almost axis aligned with WGS84 at city scale, the outer box of the corners is used.
+    """
+    xmin, ymin, xmax, ymax = bounds
+    lat, lon = swiss_to_wgs84_array([xmin, xmin, xmax, xmax], [ymin, ymax, ymin, ymax])
+    return [[float(lat.min()), float(lon.min())], [float(lat.max()), float(lon.max())]]
+
+
+def station_bounds(easting, northing, padding=0.05):
+    """
+    Bounding box of all stations with a relative padding, in LV95.
+    """
+    valid = np.isfinite(easting) & np.isfinite(northing)
+    if not valid.any():
+        return None
+    xmin, xmax = easting[valid].min(), easting[valid].max()
+    ymin, ymax = northing[valid].min(), northing[valid].max()
+    pad = padding * max(xmax - xmin, ymax - ymin, 1000)
+    return (float(xmin - pad), float(ymin - pad), float(xmax + pad), float(ymax + pad))
+
+
+def density_overlay(counts_df, start_timestamp, end_timestamp, shape=GRID_SHAPE, sigma=SIGMA, bounds=None):
+    """
+    PNG overlay of the station traffic density for a window, cached per counts frame and window.
+
+    Args:
+        counts_df (pd.DataFrame): Normalized counts (see datastore.load_counts)
+        start_timestamp (int): Window start in epoch seconds
+        end_timestamp (int): Window end in epoch seconds (inclusive)
+        shape (tuple): (rows, cols) of the grid
+        sigma (float): Gaussian smoothing in pixels, 0 to disable
+        bounds (tuple): LV95 (xmin, ymin, xmax, ymax), default: all stations plus padding
+
+    Returns:
+        dict: {"url": PNG data URL, "bounds": [[south, west], [north, east]]} or None without stations
+    """
+    cube = traffic_cube(counts_df)
+    easting = cube.stations['OST'].to_numpy(dtype=float)
+    northing = cube.stations['NORD'].to_numpy(dtype=float)
+    if bounds is None:
+        bounds = station_bounds(easting, northing)
+        if bounds is None:
+            return None
+
+    cache = derived(counts_df, 'density_overlays', lambda _: OrderedDict())
+    key = (start_timestamp, end_timestamp, tuple(shape), sigma, tuple(bounds))
+    if key in cache:
+        metrics.cache_hit("density_overlay")
+        cache.move_to_end(key)
+        return cache[key]
+    metrics.cache_miss("density_overlay")
+
+    totals = cube.station_totals(start_timestamp, end_timestamp)[:, :len(COUNT_COLUMNS)].sum(axis=1)
+    grid = gaussian_smooth(station_grid(easting, northing, totals, bounds, shape), sigma)
+    overlay = {"url": image_to_url(grid_to_rgba(grid), origin='upper'), "bounds": lv95_bounds_to_wgs84(bounds)}
+
+    cache[key] = overlay
+    while len(cache) > CACHE_SIZE:
+        cache.popitem(last=False)
+    return overlay
+
+
+def add_density_overlay(m, overlay, opacity=0.8):
+    """
+    Adds an overlay from density_overlay to a folium map.
+    """
+    ImageOverlay(image=overlay["url"], bounds=overlay["bounds"], opacity=opacity).add_to(m)
+    return m
@@ -0,0 +1,16 @@
+"""
+Kleine Datei-Hilfen ohne Streamlit, damit auch die Kommandozeilen-Werkzeuge sie importieren können.
+"""
+
+import hashlib
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """
+    SHA-1 of a file's content, read in chunks.
+    """
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
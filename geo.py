@@ -0,0 +1,65 @@
+"""
+Koordinatentransformation LV95 (EPSG:2056) -> WGS84 (EPSG:4326).
+
+Der Transformer wird einmal pro Prozess gebaut und für ganze Spalten auf einmal verwendet.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from pyproj import Transformer
+
+
+@lru_cache(maxsize=None)
+def get_transformer(source="EPSG:2056", target="EPSG:4326"):
+    """
+    Cached pyproj Transformer (thread-safe since pyproj 3.1).
+    """
+    return Transformer.from_crs(source, target, always_xy=True)
+
+
+def swiss_to_wgs84_array(easting, northing):
+    """
+    Transforms whole coordinate columns in one call.
+
+    Args:
+        easting (array-like): LV95 easting values (E / OST)
+        northing (array-like): LV95 northing values (N / NORD)
+
+    Returns:
+        tuple: (lat, lon) as NumPy float arrays
+    """
+    easting = np.asarray(easting, dtype=float)
+    northing = np.asarray(northing, dtype=float)
+    lon, lat = get_transformer().transform(easting, northing)
+    return np.asarray(lat), np.asarray(lon)
+
+
+def parse_point_geometry(geometry):
+    """
+    Splits WKT strings like 'POINT (2683000.1 1248000.2)' into coordinate arrays.
+
+    Args:
+        geometry (pd.Series): WKT point strings
+
+    Returns:
+        tuple: (easting, northing) as NumPy float arrays
+    """
+    coords = geometry.astype(str).str.extract(r'POINT\s*\(\s*(\S+)\s+(\S+)\s*\)')
+    return (pd.to_numeric(coords[0], errors='coerce').to_numpy(),
+            pd.to_numeric(coords[1], errors='coerce').to_numpy())
+
+
+def add_wgs84_columns(df, geometry_col='geometry', easting_col='OST', northing_col='NORD'):
+    """
+    Returns a copy of a station table with precomputed 'lat' / 'lon' columns.
+
+    Uses the WKT geometry column if present, otherwise the easting/northing columns.
+    """
+    if geometry_col in df.columns:
+        easting, northing = parse_point_geometry(df[geometry_col])
+    else:
+        easting, northing = df[easting_col].to_numpy(), df[northing_col].to_numpy()
+    lat, lon = swiss_to_wgs84_array(easting, northing)
+    return df.assign(lat=lat, lon=lon)
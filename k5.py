@@ -1,34 +1,11 @@
 
 
-import folium
 import streamlit as st
 import random
-import time
 import numpy as np
 
-def display_map(city, points):
-    m = folium.Map(
-        location=city,
-        zoom_start=13,
-        tiles="cartodbpositron",
-        attr="",
-        zoom_control=False,
-        scrollWheelZoom=False,
-        dragging=False
-    )
-
-    for point in points:
-        # Ensure point is a dict with coords and color
-        if isinstance(point, dict) and "coords" in point and "color" in point:
-            folium.CircleMarker(
-                location=point["coords"],
-                radius=5,
-                color=point["color"],
-                fill=True,
-                fill_color=point["color"]
-            ).add_to(m)
-
-    st.components.v1.html(m._repr_html_(), height=800)
+from animation import FPS, animation_payload
+from livemap import live_map
 
 def main():
     st.set_page_config(
@@ -48,70 +25,25 @@ def main():
             {"coords": [random.uniform(-0.01, 0.01) + 46.9480, random.uniform(-0.01, 0.01) + 7.4474], "color": "#3186cc"}
             for _ in range(3)
         ]
-    if "goals" not in st.session_state:
-        st.session_state.goals = None
-    if "interpolated" not in st.session_state:
-        st.session_state.interpolated = []
-    if "step" not in st.session_state:
-        st.session_state.step = 0
-    if "last_update" not in st.session_state:
-        st.session_state.last_update = time.time()
+    if "animation" not in st.session_state:
+        st.session_state.animation = None
 
     left, middle, right = st.columns([1, 3, 1])
     with left:
         city = st.selectbox("", ["Bern", "Zurich"])
         if st.button(""):
-            st.session_state.goals = [
-                [random.uniform(-0.01, 0.01) + cities[city][0], random.uniform(-0.01, 0.01) + cities[city][1]]
-                for _ in range(3)
-            ]
-            st.session_state.interpolated = []
-            for i, point in enumerate(st.session_state.points):
-                interp_coords = [
-                    [
-                        point["coords"][0] + j/10 * (st.session_state.goals[i][0] - point["coords"][0]),
-                        point["coords"][1] + j/10 * (st.session_state.goals[i][1] - point["coords"][1])
-                    ]
-                    for j in range(1, 11)
-                ]
-                st.session_state.interpolated.append(interp_coords)
-            st.session_state.step = 0
-            st.session_state.last_update = time.time()
+            # Start- und Zielpositionen aller Punkte, die Frames berechnet NumPy auf einmal
+            start = np.array([point["coords"] for point in st.session_state.points])
+            goals = np.array(cities[city]) + np.random.uniform(-0.01, 0.01, start.shape)
+            st.session_state.animation = animation_payload(start, goals, fps=FPS, duration=1.0)
+            # Der Server kennt sofort den Endzustand, den Weg dorthin spielt der Browser ab
+            for point, goal in zip(st.session_state.points, goals.tolist()):
+                point["coords"] = goal
 
     with middle:
-        while True:
-            st.rerun()
-
-            current_time = time.time()
-            if current_time - st.session_state.last_update >= 0.1:  # 10 times per second
-                display_points = []
-                if st.session_state.goals and st.session_state.step < 10 and st.session_state.interpolated:
-                    for i, point in enumerate(st.session_state.points):
-                        # Current point
-                        if st.session_state.step < len(st.session_state.interpolated[i]):
-                            display_points.append({
-                                "coords": st.session_state.interpolated[i][st.session_state.step],
-                                "color": "#3186cc"
-                            })
-                        # Trail points
-                        for j in range(st.session_state.step):
-                            if j < len(st.session_state.interpolated[i]):
-                                alpha = (1.0 - (st.session_state.step - j)/10) * 0.5
-                                display_points.append({
-                                    "coords": st.session_state.interpolated[i][j],
-                                    "color": f'rgba(49, 134, 204, {alpha})'
-                                })
-                    st.session_state.step += 1
-                    if st.session_state.step >= 10:
-                        for i, point in enumerate(st.session_state.points):
-                            point["coords"] = st.session_state.goals[i]
-                        st.session_state.goals = None
-                        st.session_state.interpolated = []
-                        st.session_state.step = 0
-                else:
-                    display_points = st.session_state.points
-                display_map(cities[city], display_points)
-                st.session_state.last_update = current_time
+        # Kein Rerun pro Frame: die Animation läuft in der Kartenkomponente
+        points = [] if st.session_state.animation else st.session_state.points
+        live_map(cities[city], 13, points, animation=st.session_state.animation, height=800, key="k5")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
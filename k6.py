@@ -9,17 +9,23 @@ import os
 from datetime import datetime, timedelta
 import numpy as np
 import folium
-from pyproj import Transformer
 import plotly.express as px
 
-
-def swiss_to_wgs84(easting, northing):
-    transformer = Transformer.from_crs("EPSG:2056", "EPSG:4326", always_xy=True)
-    lon, lat = transformer.transform(easting, northing)
-    return [lat, lon]
-
-
-def display_map(city_coords, points, zoom=13):
+from cities import CITIES, FrameUnion, map_view
+from datastore import load_counts, load_csv, load_stations, normalize_counts, station_index
+from density import density_overlay
+from geo import swiss_to_wgs84_array
+from livemap import live_map
+from maplayers import CircleMarkerLayer
+import metrics
+from regions import REGION_LAYERS, region_choropleth
+from rollup import traffic_baselines, traffic_cube
+from timeindex import time_index, window_end
+from weather import daily_weather_summary
+from weatherjoin import joined_weather
+
+
+def display_map(city_coords, points, zoom=13, single_layer=True):
     m = folium.Map(
         location=city_coords,
         zoom_start=zoom,
@@ -27,8 +33,13 @@ def display_map(city_coords, points, zoom=13):
         attr="",
         zoom_control=False,
         scrollWheelZoom=False,
-        dragging=False
+        dragging=False,
+        prefer_canvas=True
     )
+    if single_layer:
+        # One compact data array and one canvas layer instead of one JS block per marker
+        CircleMarkerLayer([point for point in points if isinstance(point, dict) and "radius" in point]).add_to(m)
+        return m
     for point in points:
         if isinstance(point, dict) and "coords" in point and "color" in point and "radius" in point:
             folium.CircleMarker(
@@ -45,7 +56,7 @@ def display_map(city_coords, points, zoom=13):
 def load_weather_data(file, file_path=None):
     try:
         if isinstance(file, str) and os.path.exists(file):
-            df = pd.read_csv(file)
+            df = load_csv(file)
         else:
             df = pd.read_csv(file)
         if df.empty or 'dt' not in df.columns:
@@ -57,10 +68,10 @@ def load_weather_data(file, file_path=None):
         return None
 
 
-def load_mobility_data(file_path):
+def load_mobility_data(file_path, loader=load_csv):
     try:
         if os.path.exists(file_path):
-            df = pd.read_csv(file_path)
+            df = loader(file_path)
             if df.empty:
                 st.error(f"No data in {file_path}.")
                 return None
@@ -74,47 +85,19 @@ def load_mobility_data(file_path):
 
 
 def filter_weather_data(df, start_timestamp, duration, unit):
+    if isinstance(df, FrameUnion):
+        # mehrere Städte: nur das Fenster jeder Partition wird vereint
+        return df.window('dt', start_timestamp, duration, unit) if not df.empty else pd.DataFrame()
     if df is not None and not df.empty:
-        if unit == "Hours":
-            end_timestamp = start_timestamp + duration * 3600
-        elif unit == "Days":
-            end_timestamp = start_timestamp + duration * 86400
-        else:  # Months
-            start_date = datetime.fromtimestamp(start_timestamp)
-            end_date = (start_date + pd.offsets.MonthBegin(duration)).timestamp()
-            end_timestamp = int(end_date)
-        filtered = df[(df['dt'] >= start_timestamp) & (df['dt'] <= end_timestamp)]
-        return filtered
+        return time_index(df, 'dt').window(start_timestamp, duration, unit)
     return pd.DataFrame()
 
 
 def get_representative_weather(df, duration, unit):
     if df.empty:
         return df
-    if unit == "Months":
-        df['date'] = pd.to_datetime(df['dt'], unit='s').dt.date
-        daily = df.groupby('date').agg({
-            'temp': 'mean',
-            'humidity': 'mean',
-            'wind_speed': 'mean',
-            'weather_icon': lambda x: x.mode().iloc[0] if not x.mode().empty else x.iloc[0],
-            'weather_description': lambda x: x.mode().iloc[0] if not x.mode().empty else x.iloc[0],
-            'dt': 'first'
-        }).reset_index()
-        if len(daily) > duration:
-            indices = np.linspace(0, len(daily) - 1, duration, dtype=int)
-            daily = daily.iloc[indices]
-        return daily
-    elif unit == "Days":
-        df['date'] = pd.to_datetime(df['dt'], unit='s').dt.date
-        daily = df.groupby('date').agg({
-            'temp': 'mean',
-            'humidity': 'mean',
-            'wind_speed': 'mean',
-            'weather_icon': lambda x: x.mode().iloc[0] if not x.mode().empty else x.iloc[0],
-            'weather_description': lambda x: x.mode().iloc[0] if not x.mode().empty else x.iloc[0],
-            'dt': 'first'
-        }).reset_index()
+    if unit in ("Days", "Months"):
+        daily = daily_weather_summary(df)
         if len(daily) > duration:
             indices = np.linspace(0, len(daily) - 1, duration, dtype=int)
             daily = daily.iloc[indices]
@@ -174,30 +157,12 @@ def process_traffic_data(points_df, counts_df, start_timestamp, duration, unit):
     if points_df is None or counts_df is None:
         return []
 
-    # Convert DATUM to timestamp
-    counts_df['DATUM'] = pd.to_datetime(counts_df['DATUM']).apply(lambda x: int(x.timestamp()))
+    # Counts from load_counts already carry the epoch column
+    if 'DATUM_TS' not in counts_df.columns:
+        counts_df = normalize_counts(counts_df)
 
-    # Filter counts by time range
-    if unit == "Hours":
-        end_timestamp = start_timestamp + duration * 3600
-    elif unit == "Days":
-        end_timestamp = start_timestamp + duration * 86400
-    else:  # Months
-        start_date = datetime.fromtimestamp(start_timestamp)
-        end_date = (start_date + pd.offsets.MonthBegin(duration)).timestamp()
-        end_timestamp = int(end_date)
-
-    filtered_counts = counts_df[(counts_df['DATUM'] >= start_timestamp) & (counts_df['DATUM'] <= end_timestamp)]
-
-    # Aggregate traffic by FK_STANDORT
-    traffic = filtered_counts.groupby('FK_STANDORT').agg({
-        'VELO_IN': 'sum',
-        'VELO_OUT': 'sum',
-        'FUSS_IN': 'sum',
-        'FUSS_OUT': 'sum',
-        'OST': 'first',  # Take first coordinate for consistency
-        'NORD': 'first'
-    }).reset_index()
+    # Window totals per station from the precomputed rollup cube
+    traffic = traffic_cube(counts_df).window(start_timestamp, duration, unit)
 
     traffic['total_traffic'] = (traffic['VELO_IN'].fillna(0) +
                                traffic['VELO_OUT'].fillna(0) +
@@ -208,43 +173,151 @@ def process_traffic_data(points_df, counts_df, start_timestamp, duration, unit):
     max_traffic = traffic['total_traffic'].max() if traffic['total_traffic'].max() > 0 else 1
     traffic['traffic_norm'] = traffic['total_traffic'] / max_traffic
 
-    points = []
-    for _, traffic_row in traffic.iterrows():
-        easting, northing = traffic_row['OST'], traffic_row['NORD']
-        lat, lon = swiss_to_wgs84(easting, northing)
+    # Transform all coordinates in one call
+    traffic['lat'], traffic['lon'] = swiss_to_wgs84_array(traffic['OST'], traffic['NORD'])
+
+    # Match FK_STANDORT with fk_zaehler for popup name: one hash join against the station index
+    traffic['standort'] = traffic['FK_STANDORT'].astype(str)
+    traffic = traffic.join(station_index(points_df), on='standort', rsuffix='_station')
+    if 'lat_station' in traffic.columns:
+        traffic['lat'] = traffic['lat'].fillna(traffic['lat_station'])
+        traffic['lon'] = traffic['lon'].fillna(traffic['lon_station'])
+    if 'bezeichnung' in traffic.columns:
+        names = traffic['bezeichnung'].fillna('Standort ' + traffic['standort'])
+    else:
+        names = 'Standort ' + traffic['standort']
+
+    total_traffic = traffic['total_traffic'].to_numpy()
+    traffic_norm = traffic['traffic_norm'].to_numpy()
+    # Interpolate color from blue (low) to red (high), grey without traffic
+    red = (255 * traffic_norm).astype(int)
+    blue = (255 * (1 - traffic_norm)).astype(int)
+    colors = ['grey' if total == 0 else f'rgb({r}, 0, {b})' for total, r, b in zip(total_traffic, red, blue)]
+    # Scale radius from 5 to 15
+    radii = np.where(total_traffic == 0, 3, 5 + 10 * traffic_norm)
+    popups = [
+        f"{name}: {total:.0f} (Velo: {velo_in:.0f}/{velo_out:.0f}, Fuss: {fuss_in:.0f}/{fuss_out:.0f})"
+        for name, total, velo_in, velo_out, fuss_in, fuss_out in zip(
+            names, total_traffic, traffic['VELO_IN'], traffic['VELO_OUT'], traffic['FUSS_IN'], traffic['FUSS_OUT'])
+    ]
+
+    points = [{
+        "coords": [lat, lon],
+        "color": color,
+        "radius": radius,
+        "popup": popup
+    } for lat, lon, color, radius, popup in zip(traffic['lat'].tolist(), traffic['lon'].tolist(),
+                                                 colors, radii.tolist(), popups)]
 
-        # Match FK_STANDORT with fk_zaehler for popup name
-        standort = str(traffic_row['FK_STANDORT'])
-        point_row = points_df[points_df['fk_zaehler'].astype(str) == standort]
+    return points
 
-        total_traffic = traffic_row['total_traffic']
-        traffic_norm = traffic_row['traffic_norm']
 
-        if total_traffic == 0:
-            color = 'grey'
-            radius = 3
-        else:
-            # Interpolate color from blue (low) to red (high)
-            blue = int(255 * (1 - traffic_norm))
-            red = int(255 * traffic_norm)
-            color = f'rgb({red}, 0, {blue})'
-            # Scale radius from 5 to 15
-            radius = 5 + 10 * traffic_norm
-
-        if not point_row.empty:
-            bezeichnung = point_row['bezeichnung'].iloc[0]
-            popup = f"{bezeichnung}: {total_traffic:.0f} (Velo: {traffic_row['VELO_IN']:.0f}/{traffic_row['VELO_OUT']:.0f}, Fuss: {traffic_row['FUSS_IN']:.0f}/{traffic_row['FUSS_OUT']:.0f})"
-        else:
-            popup = f"Standort {standort}: {total_traffic:.0f} (Velo: {traffic_row['VELO_IN']:.0f}/{traffic_row['VELO_OUT']:.0f}, Fuss: {traffic_row['FUSS_IN']:.0f}/{traffic_row['FUSS_OUT']:.0f})"
+def key_statistics(window_totals, counts_frames, start_timestamp, duration, unit):
+    """
+    Numbers of the Key Statistics panel for one window.
+
+    Args:
+        window_totals (pd.Series): Window totals summed over the counting networks (TrafficCube.totals)
+        counts_frames (list): Normalized counts tables of the selected networks
+        start_timestamp (int): Start of the window
+        duration (int): Length of the window in `unit`
+        unit (str): "Hours", "Days" or "Months"
+
+    Returns:
+        dict: Totals and per-hour averages of the window, the year and the time of day, and the
+            comparison sentence (None without time-of-day data)
+    """
+    # Totals for selected period (from the cumulative arrays of the rollup cube)
+    total_pedestrians = window_totals['FUSS_IN'] + window_totals['FUSS_OUT']
+    total_cyclists = window_totals['VELO_IN'] + window_totals['VELO_OUT']
+
+    # Calculate timespan in hours
+    end_timestamp = window_end(start_timestamp, duration, unit)
+    timespan_hours = (end_timestamp - start_timestamp) / 3600
+    avg_pedestrians = total_pedestrians / timespan_hours if timespan_hours > 0 else 0
+    avg_cyclists = total_cyclists / timespan_hours if timespan_hours > 0 else 0
+
+    # Full-dataset baselines, computed once per dataset version and summed over the networks
+    network_baselines = [traffic_baselines(counts_df) for counts_df in counts_frames]
+    baselines = {key: sum(entry[key] for entry in network_baselines)
+                 for key in ('total', 'hour_of_day', 'daily_mean')}
+
+    # Calculate yearly averages
+    year_totals = baselines['total']
+    year_hours = 365 * 24  # Approximate hours in 2023
+    avg_year_peds = (year_totals['FUSS_IN'] + year_totals['FUSS_OUT']) / year_hours
+    avg_year_cycs = (year_totals['VELO_IN'] + year_totals['VELO_OUT']) / year_hours
+
+    # Calculate time-of-day averages
+    avg_time_peds = 0
+    avg_time_cycs = 0
+    comparison_text = None
+    if unit == "Hours":
+        time_avg = baselines['hour_of_day'].loc[datetime.fromtimestamp(start_timestamp).hour]
+    else:  # Days or Months, use daily averages
+        time_avg = baselines['daily_mean']  # Average across all days
+
+    if time_avg['rows'] > 0:
+        avg_time_peds = (time_avg['FUSS_IN'] + time_avg['FUSS_OUT']) / (1 if unit == "Hours" else 24)
+        avg_time_cycs = (time_avg['VELO_IN'] + time_avg['VELO_OUT']) / (1 if unit == "Hours" else 24)
+
+        # Comparison sentence
+        cycs_diff = ((avg_cyclists - avg_time_cycs) / avg_time_cycs * 100) if avg_time_cycs > 0 else 0
+        peds_diff = ((avg_pedestrians - avg_time_peds) / avg_time_peds * 100) if avg_time_peds > 0 else 0
+        cycs_comp = "more" if cycs_diff >= 0 else "less"
+        peds_comp = "more" if peds_diff >= 0 else "less"
+        comparison_text = (
+            f"In your selected time period, {total_cyclists:,.0f} cyclists and {total_pedestrians:,.0f} pedestrians were registered. "
+            f"This is {abs(cycs_diff):.1f}% {cycs_comp} cyclists and {abs(peds_diff):.1f}% {peds_comp} pedestrians than the average for this time of day."
+        )
+
+    return {
+        "total_pedestrians": total_pedestrians,
+        "total_cyclists": total_cyclists,
+        "avg_pedestrians": avg_pedestrians,
+        "avg_cyclists": avg_cyclists,
+        "avg_year_peds": avg_year_peds,
+        "avg_year_cycs": avg_year_cycs,
+        "avg_time_peds": avg_time_peds,
+        "avg_time_cycs": avg_time_cycs,
+        "comparison_text": comparison_text
+    }
+
+
+def weather_traffic(mobility, weather_of, start_timestamp, end_timestamp):
+    """
+    Traffic of a window per weather condition.
+
+    The counts of every network are joined once with the weather of their city (weatherjoin.py,
+    the same join as sta.py), a window only cuts its rows from the joined frame.
+
+    Args:
+        mobility (list): (city, points_df, counts_df) per counting network
+        weather_of (dict): City name -> weather frame
+        start_timestamp (int): Start of the window
+        end_timestamp (int): End of the window (inclusive)
+
+    Returns:
+        pd.DataFrame: Pedestrians and cyclists per weather_main, empty without counts in the window
+    """
+    windows = []
+    for city, _, counts_df in mobility:
+        weather_df = weather_of.get(city.name)
+        if weather_df is None or 'weather_main' not in weather_df.columns:
+            continue
+        joined = joined_weather(counts_df, weather_df, columns=['weather_main'])
+        windows.append(time_index(joined, 'DATUM_TS').between(start_timestamp, end_timestamp))
+    window = pd.concat(windows) if windows else pd.DataFrame()
+    if window.empty:
+        return pd.DataFrame()
+    table = pd.DataFrame({
+        'Weather': window['weather_main'].fillna('unknown').to_numpy(),
+        'Pedestrians': window[['FUSS_IN', 'FUSS_OUT']].fillna(0).sum(axis=1).to_numpy(),
+        'Cyclists': window[['VELO_IN', 'VELO_OUT']].fillna(0).sum(axis=1).to_numpy()
+    })
+    return table.groupby('Weather').sum().sort_values('Cyclists', ascending=False)
 
-        points.append({
-            "coords": [lat, lon],
-            "color": color,
-            "radius": radius,
-            "popup": popup
-        })
 
-    return points
 def main_old():
     st.set_page_config(page_title="Weather Visualization", layout="wide")
 
@@ -263,8 +336,8 @@ def main_old():
     # Load mobility data
     default_points_path = "arbeit/mobility_zurich/standorte.csv"
     default_counts_path = "arbeit/mobility_zurich/zurich_mobility.csv"
-    zurich_points_df = load_mobility_data(default_points_path)
-    zurich_counts_df = load_mobility_data(default_counts_path)
+    zurich_points_df = load_mobility_data(default_points_path, loader=load_stations)
+    zurich_counts_df = load_mobility_data(default_counts_path, loader=load_counts)
 
     show_weather_rain = False
     show_weather_temp = False
@@ -312,17 +385,9 @@ def main_old():
             st.session_state.filtered_counts = pd.DataFrame()
             if city in ["Zurich", "both"] and zurich_points_df is not None and zurich_counts_df is not None:
                 # Filter counts for session state
-                counts_df = zurich_counts_df.copy()
-                counts_df['DATUM'] = pd.to_datetime(counts_df['DATUM']).apply(lambda x: int(x.timestamp()))
-                if unit == "Hours":
-                    end_timestamp = start_timestamp + duration * 3600
-                elif unit == "Days":
-                    end_timestamp = start_timestamp + duration * 86400
-                else:  # Months
-                    start_date = datetime.fromtimestamp(start_timestamp)
-                    end_date = start_date + pd.offsets.MonthEnd(0) + pd.offsets.MonthBegin(duration)
-                    end_timestamp = int(end_date.timestamp())
-                st.session_state.filtered_counts = counts_df[(counts_df['DATUM'] >= start_timestamp) & (counts_df['DATUM'] <= end_timestamp)]
+                end_timestamp = window_end(start_timestamp, duration, unit)
+                counts_index = time_index(zurich_counts_df, 'DATUM_TS')
+                st.session_state.filtered_counts = counts_index.between(start_timestamp, end_timestamp)
                 st.session_state.points = process_traffic_data(zurich_points_df, zurich_counts_df, start_timestamp, duration, unit)
             elif city == "Bern":
                 city_coords = cities["Bern"]
@@ -422,40 +487,83 @@ def main_old():
             st.markdown("No mobility data available for the selected city or time range.")
 
 
+def debug_enabled():
+    # Debug-Sidebar mit ?debug=1 in der URL oder DAVIS_DEBUG=1
+    return st.query_params.get("debug") == "1" or os.environ.get("DAVIS_DEBUG") == "1"
+
+
+def show_metrics_sidebar(run):
+    """
+    Shows the stage timings and cache counters of a finished rerun in the sidebar.
+    """
+    with st.sidebar:
+        st.header("Debug")
+        st.markdown(f"**Rerun**: {run.seconds * 1000:,.1f} ms")
+        stages = pd.DataFrame([
+            {"stage": name, "ms": round(entry["seconds"] * 1000, 1), "calls": entry["calls"], "rows": entry["rows"]}
+            for name, entry in run.stages.items()
+        ])
+        if not stages.empty:
+            st.dataframe(stages, hide_index=True, use_container_width=True)
+        caches = pd.DataFrame([
+            {"cache": cache, "hit": run.caches.get(cache, {}).get("hit", 0),
+             "miss": run.caches.get(cache, {}).get("miss", 0),
+             "hit (total)": totals["hit"], "miss (total)": totals["miss"]}
+            for cache, totals in sorted(metrics.cache_totals().items())
+        ])
+        if not caches.empty:
+            st.dataframe(caches, hide_index=True, use_container_width=True)
+        if os.environ.get(metrics.METRICS_FILE_ENV):
+            st.caption(f"Metrics file: {os.environ[metrics.METRICS_FILE_ENV]}")
+
+
 def main():
     st.set_page_config(page_title="Weather Visualization", layout="wide")
+    if '_metrics_session' not in st.session_state:
+        st.session_state._metrics_session = os.urandom(4).hex()
+    run = metrics.start_run(st.session_state._metrics_session)
 
     # Initialize session state
     if 'points' not in st.session_state:
         st.session_state.points = []
-    if 'filtered_counts' not in st.session_state:
-        st.session_state.filtered_counts = pd.DataFrame()
-
-    # Load weather data
-    default_path_bern = "arbeit/wetter/bern_23_clean.csv"
-    default_path_zurich = "arbeit/wetter/zurich_23_clean.csv"
-    wetter_Bern = load_weather_data(default_path_bern, default_path_bern)
-    wetter_Zurich = load_weather_data(default_path_zurich, default_path_zurich)
-
-    # Load mobility data
-    default_points_path = "arbeit/mobility_zurich/standorte.csv"
-    default_counts_path = "arbeit/mobility_zurich/zurich_mobility.csv"
-    zurich_points_df = load_mobility_data(default_points_path)
-    zurich_counts_df = load_mobility_data(default_counts_path)
+    if 'window_totals' not in st.session_state:
+        st.session_state.window_totals = None
+    if 'density' not in st.session_state:
+        st.session_state.density = None
 
     show_weather_rain = False
     show_weather_temp = False
     show_weather_wind = False
 
-    cities = {
-        "Bern": [46.9480, 7.4474],
-        "Zurich": [47.3769, 8.5417]
-    }
     left, b, middle, c, right = st.columns([2, 1, 10, 1, 2])
 
     with left:
         st.header("Controls")
-        city = st.selectbox("City", ["Bern", "Zurich", "both"])
+        city_names = st.multiselect("City", list(CITIES), default=["Bern"])
+        if not city_names:
+            st.info("Select at least one city.")
+            return
+        selected = [CITIES[name] for name in city_names]
+
+        # Only the selected cities are loaded, each source stays its own partition
+        with metrics.stage("load_weather_data"):
+            weather_parts = [load_weather_data(city.weather_path, city.weather_path) for city in selected]
+        # Cities without weather data are left out, the others are still shown
+        failed = [city.name for city, part in zip(selected, weather_parts) if part is None]
+        if failed:
+            st.error(f"No data available for {', '.join(failed)}. Check CSV files.")
+        selected = [city for city, part in zip(selected, weather_parts) if part is not None]
+        weather_parts = [part for part in weather_parts if part is not None]
+        weather_of = {city.name: part for city, part in zip(selected, weather_parts)}
+        with metrics.stage("load_mobility_data"):
+            mobility = []
+            for city in selected:
+                for source in city.mobility:
+                    points_df = load_mobility_data(source.points_path, loader=load_stations)
+                    counts_df = load_mobility_data(source.counts_path, loader=load_counts)
+                    if points_df is not None and counts_df is not None:
+                        mobility.append((city, points_df, counts_df))
+
         start_date = st.date_input("Start date", value=datetime(2023, 1, 1))
         start_datetime = datetime(start_date.year, start_date.month, start_date.day, 1)  # Set to 01:00 UTC
         start_timestamp = int(start_datetime.timestamp())
@@ -463,6 +571,10 @@ def main():
         unit = st.selectbox("Unit", ["Hours", "Days", "Months"])
         duration = st.slider("Duration", 1, 24 if unit == "Hours" else 31, 12 if unit == "Hours" else 10)
 
+        show_density = st.toggle("show traffic density")
+        show_regions = st.toggle("show traffic per area")
+        if show_regions:
+            region_layer = st.selectbox("Area", REGION_LAYERS, format_func=str.capitalize)
         show_dataf = st.toggle("show data")
         show_weather = st.toggle("show weather average")
         if st.toggle("show weather detail", True):
@@ -470,194 +582,158 @@ def main():
             show_weather_temp = st.toggle("show temp")
             show_weather_wind = st.toggle("show wind")
 
-        # Select and filter data
+        # Select and filter data (lazy union of the city partitions, no concat of full frames)
         wetter = None
-        if city == "Bern" and wetter_Bern is not None:
-            wetter = wetter_Bern
-        elif city == "Zurich" and wetter_Zurich is not None:
-            wetter = wetter_Zurich
-        elif city == "both" and wetter_Bern is not None and wetter_Zurich is not None:
-            wetter = pd.concat([wetter_Bern, wetter_Zurich])
+        if weather_parts:
+            wetter = FrameUnion(weather_parts)
 
         if wetter is None:
-            st.error(f"No data available for {city}. Check CSV files.")
             filtered_df = pd.DataFrame()
         else:
-            filtered_df = filter_weather_data(wetter, start_timestamp, duration, unit)
+            with metrics.stage("filter_weather_data") as timing:
+                filtered_df = filter_weather_data(wetter, start_timestamp, duration, unit)
+                timing.rows = len(filtered_df)
             # Update points and filtered counts
             st.session_state.points = []
-            st.session_state.filtered_counts = pd.DataFrame()
-            if city in ["Zurich", "both"] and zurich_points_df is not None and zurich_counts_df is not None:
-                # Filter counts for session state
-                counts_df = zurich_counts_df.copy()
-                counts_df['DATUM'] = pd.to_datetime(counts_df['DATUM']).apply(lambda x: int(x.timestamp()))
-                if unit == "Hours":
-                    end_timestamp = start_timestamp + duration * 3600
-                elif unit == "Days":
-                    end_timestamp = start_timestamp + duration * 86400
-                else:  # Months
-                    start_date = datetime.fromtimestamp(start_timestamp)
-                    end_date = start_date + pd.offsets.MonthEnd(0) + pd.offsets.MonthBegin(duration)
-                    end_timestamp = int(end_date.timestamp())
-                st.session_state.filtered_counts = counts_df[(counts_df['DATUM'] >= start_timestamp) & (counts_df['DATUM'] <= end_timestamp)]
-                st.session_state.points = process_traffic_data(zurich_points_df, zurich_counts_df, start_timestamp, duration, unit)
-            elif city == "Bern":
-                city_coords = cities["Bern"]
+            st.session_state.window_totals = None
+            st.session_state.density = None
+            if mobility:
+                # Window totals for the statistics panel, summed over the counting networks
+                end_timestamp = window_end(start_timestamp, duration, unit)
+                with metrics.stage("window_totals") as timing:
+                    st.session_state.window_totals = sum(
+                        traffic_cube(counts_df).totals(start_timestamp, end_timestamp) for _, _, counts_df in mobility)
+                    timing.rows = st.session_state.window_totals['rows']
+                if show_density:
+                    # One raster image instead of one circle per station
+                    with metrics.stage("density_overlay"):
+                        st.session_state.density = [
+                            density_overlay(counts_df, start_timestamp, end_timestamp) for _, _, counts_df in mobility]
+                else:
+                    with metrics.stage("process_traffic_data") as timing:
+                        for _, points_df, counts_df in mobility:
+                            st.session_state.points += process_traffic_data(points_df, counts_df, start_timestamp, duration, unit)
+                        timing.rows = len(st.session_state.points)
+            else:
                 st.session_state.points = [{
-                    "coords": [city_coords[0], city_coords[1]],
+                    "coords": city.center,
                     "color": "grey",
                     "radius": 3,
-                    "popup": "Bern: No traffic data"
-                }]
+                    "popup": f"{city.name}: No traffic data"
+                } for city in selected]
 
     with middle:
         st.header("wie beeinflusst das Wetter die Nutzung von Verkehrsmitteln in Bern und Zürich?")
         st.write("in dieser Datenvisualisierung kann für das Jahr 2023 Wetter und Mobilitätsdaten verglichen werden.")
         st.write("dieser Prototyp ist ein zwischenstand, es werden weitere Daten, Visualisierungen und (statistische) Auswertungen hinzugefügt.")
         if not filtered_df.empty:
-            representative_df = get_representative_weather(filtered_df, duration, unit)
+            with metrics.stage("get_representative_weather") as timing:
+                representative_df = get_representative_weather(filtered_df, duration, unit)
+                timing.rows = len(representative_df)
             if not representative_df.empty:
                 st.subheader("Weather Conditions")
-                cols = st.columns(len(representative_df))
-                for i, (col, row) in enumerate(zip(cols, representative_df.iterrows())):
-                    with col:
-                        timestamp = pd.to_datetime(row[1]['dt'], unit='s')
-                        if unit == "Hours":
-                            label = timestamp.strftime('%H:%M')
-                        elif unit == "Days":
-                            label = timestamp.strftime('%d.%m.')
-                        else:  # Months
-                            label = timestamp.strftime('%b')
-                        st.write(label)
-                        if show_weather:
-                            emoji = get_weather_emoji(row[1]['weather_icon'])
-                            if st.button(f"{emoji}", key=f"{emoji}_{i}"):
-                                st.write(
-                                    f"{emoji} {timestamp.strftime('%Y-%m-%d %H:%M:%S')}: {row[1]['weather_description'].capitalize()} "
-                                    f"(Temp: {row[1]['temp']:.1f}°C, Humidity: {row[1]['humidity']}%, Wind: {row[1]['wind_speed']:.1f} m/s)")
-                        if show_weather_wind:
-                            wind_speed = row[1]['wind_speed']
-                            st.markdown(f"Wind: {wind_speed:.1f} m/s {wind_visual(wind_speed)}", unsafe_allow_html=True)
-
-                        if show_weather_rain:
-                            rain = row[1].get('rain_1h', 0)
-                            if rain >= 0:
-                                st.markdown(f"{rain} mm 🌧️ {rain_bar(rain)}", unsafe_allow_html=True)
-                            else:
-                                st.markdown(f"trocken {rain_bar(rain)}", unsafe_allow_html=True)
-
-                        if show_weather_temp:
-                            temp = row[1]['temp']
-                            st.markdown(
-                                f"<div style='{temp_to_color(temp)}; padding: 5px; border-radius: 5px;'>Temp: {temp:.1f}°C 🌡️</div>",
-                                unsafe_allow_html=True
-                            )
+                with metrics.stage("weather_widgets", rows=len(representative_df)):
+                    cols = st.columns(len(representative_df))
+                    for i, (col, row) in enumerate(zip(cols, representative_df.iterrows())):
+                        with col:
+                            timestamp = pd.to_datetime(row[1]['dt'], unit='s')
+                            if unit == "Hours":
+                                label = timestamp.strftime('%H:%M')
+                            elif unit == "Days":
+                                label = timestamp.strftime('%d.%m.')
+                            else:  # Months
+                                label = timestamp.strftime('%b')
+                            st.write(label)
+                            if show_weather:
+                                emoji = get_weather_emoji(row[1]['weather_icon'])
+                                if st.button(f"{emoji}", key=f"{emoji}_{i}"):
+                                    st.write(
+                                        f"{emoji} {timestamp.strftime('%Y-%m-%d %H:%M:%S')}: {row[1]['weather_description'].capitalize()} "
+                                        f"(Temp: {row[1]['temp']:.1f}°C, Humidity: {row[1]['humidity']}%, Wind: {row[1]['wind_speed']:.1f} m/s)")
+                            if show_weather_wind:
+                                wind_speed = row[1]['wind_speed']
+                                st.markdown(f"Wind: {wind_speed:.1f} m/s {wind_visual(wind_speed)}", unsafe_allow_html=True)
+
+                            if show_weather_rain:
+                                rain = row[1].get('rain_1h', 0)
+                                if rain >= 0:
+                                    st.markdown(f"{rain} mm 🌧️ {rain_bar(rain)}", unsafe_allow_html=True)
+                                else:
+                                    st.markdown(f"trocken {rain_bar(rain)}", unsafe_allow_html=True)
+
+                            if show_weather_temp:
+                                temp = row[1]['temp']
+                                st.markdown(
+                                    f"<div style='{temp_to_color(temp)}; padding: 5px; border-radius: 5px;'>Temp: {temp:.1f}°C 🌡️</div>",
+                                    unsafe_allow_html=True
+                                )
+            if mobility:
+                # Counts of the window with the weather of the same hour
+                with metrics.stage("weather_traffic") as timing:
+                    by_weather = weather_traffic(mobility, weather_of, start_timestamp,
+                                                 window_end(start_timestamp, duration, unit))
+                    timing.rows = len(by_weather)
+                if not by_weather.empty:
+                    st.subheader("Traffic by Weather")
+                    st.dataframe(by_weather.style.format("{:,.0f}"), use_container_width=True)
 
         else:
             st.warning("No weather data available. Check time range or CSV data.")
         st.subheader("karte")
         if not filtered_df.empty:
-            if city == "both":
-                center = [(cities["Bern"][0] + cities["Zurich"][0]) / 2,
-                          (cities["Bern"][1] + cities["Zurich"][1]) / 2]
-                m = display_map(center, st.session_state.points, zoom=9)
-                folium.Marker(cities["Bern"], popup="Bern").add_to(m)
-                folium.Marker(cities["Zurich"], popup="Zurich").add_to(m)
-            else:
-                m = display_map(cities[city], st.session_state.points)
-            st.components.v1.html(m._repr_html_(), height=600)
+            # Base map stays alive in the browser, only changed points are sent
+            center, zoom = map_view(selected)
+            pins = [{"coords": city.center, "popup": city.name} for city in selected] if len(selected) > 1 else None
+            with metrics.stage("map", rows=len(st.session_state.points)):
+                live_map(center, zoom, st.session_state.points, pins=pins, overlay=st.session_state.density, height=600)
         else:
             st.warning("Map not displayed due to missing weather data.")
+        if show_regions and mobility and not filtered_df.empty:
+            # Choropleth next to the station map, stations assigned to their polygon once per dataset
+            st.subheader(f"Verkehr pro {region_layer.capitalize()}")
+            end_timestamp = window_end(start_timestamp, duration, unit)
+            with metrics.stage("region_choropleth"):
+                try:
+                    regions = [region_choropleth(counts_df, start_timestamp, end_timestamp, zoom, region_layer)
+                               for _, _, counts_df in mobility]
+                except FileNotFoundError as e:
+                    st.error(f"Boundaries not available: {e}")
+                    regions = None
+            if regions is not None:
+                live_map(center, zoom, [], regions=regions, height=600, key="regionen")
         if show_dataf:
             st.subheader("Data Table")
             st.dataframe(filtered_df[['dt', 'dt_iso', 'temp', 'humidity', 'wind_speed', 'weather_description']],
                          use_container_width=True)
-            if zurich_points_df is not None:
-                st.dataframe(zurich_points_df, use_container_width=True)
-            if zurich_counts_df is not None:
-                st.dataframe(zurich_counts_df, use_container_width=True)
+            for _, points_df, counts_df in mobility:
+                st.dataframe(points_df, use_container_width=True)
+                st.dataframe(counts_df, use_container_width=True)
 
 
-    with right:
+    with right, metrics.stage("key_statistics"):
         st.header("Key Statistics")
-        if city in ["Zurich", "both"] and not st.session_state.filtered_counts.empty:
-            filtered_counts = st.session_state.filtered_counts
-            # Calculate totals for selected period
-            total_pedestrians = filtered_counts['FUSS_IN'].fillna(0).sum() + filtered_counts['FUSS_OUT'].fillna(0).sum()
-            total_cyclists = filtered_counts['VELO_IN'].fillna(0).sum() + filtered_counts['VELO_OUT'].fillna(0).sum()
-
-            # Calculate timespan in hours
-            if unit == "Hours":
-                end_timestamp = start_timestamp + duration * 3600
-            elif unit == "Days":
-                end_timestamp = start_timestamp + duration * 86400
-            else:  # Months
-                start_date = datetime.fromtimestamp(start_timestamp)
-                end_date = start_date + pd.offsets.MonthEnd(0) + pd.offsets.MonthBegin(duration)
-                end_timestamp = int(end_date.timestamp())
-            timespan_hours = (end_timestamp - start_timestamp) / 3600
-            avg_pedestrians = total_pedestrians / timespan_hours if timespan_hours > 0 else 0
-            avg_cyclists = total_cyclists / timespan_hours if timespan_hours > 0 else 0
-
-            st.markdown(f"**Total Pedestrians**: {total_pedestrians:,.0f}")
-            st.markdown(f"**Total Cyclists**: {total_cyclists:,.0f}")
-            st.markdown(f"**Avg. Pedestrians/Hour**: {avg_pedestrians:,.1f}")
-            st.markdown(f"**Avg. Cyclists/Hour**: {avg_cyclists:,.1f}")
-
-            # Calculate yearly averages
-            if zurich_counts_df is not None:
-                year_counts = zurich_counts_df.copy()
-                total_year_peds = year_counts['FUSS_IN'].fillna(0).sum() + year_counts['FUSS_OUT'].fillna(0).sum()
-                total_year_cycs = year_counts['VELO_IN'].fillna(0).sum() + year_counts['VELO_OUT'].fillna(0).sum()
-                year_hours = 365 * 24  # Approximate hours in 2023
-                avg_year_peds = total_year_peds / year_hours
-                avg_year_cycs = total_year_cycs / year_hours
-                st.markdown(f"**Yearly Avg. Pedestrians/Hour**: {avg_year_peds:,.1f}")
-                st.markdown(f"**Yearly Avg. Cyclists/Hour**: {avg_year_cycs:,.1f}")
-
-            # Calculate time-of-day averages
-            avg_time_peds = 0
-            avg_time_cycs = 0
-            comparison_text = "No comparison available due to missing time-of-day data."
-            if zurich_counts_df is not None:
-                time_counts = zurich_counts_df.copy()
-                time_counts['DATUM_DT'] = pd.to_datetime(time_counts['DATUM'])
-                if unit == "Hours":
-                    time_counts['time_key'] = time_counts['DATUM_DT'].dt.hour
-                    start_hour = start_datetime.hour
-                    time_avg = time_counts[time_counts['time_key'] == start_hour].groupby('time_key').agg({
-                        'FUSS_IN': 'sum', 'FUSS_OUT': 'sum', 'VELO_IN': 'sum', 'VELO_OUT': 'sum'
-                    })
-                else:  # Days or Months, use daily averages
-                    time_counts['time_key'] = time_counts['DATUM_DT'].dt.date
-                    time_avg = time_counts.groupby('time_key').agg({
-                        'FUSS_IN': 'sum', 'FUSS_OUT': 'sum', 'VELO_IN': 'sum', 'VELO_OUT': 'sum'
-                    })
-                    time_avg = time_avg.mean().to_frame().T  # Average across all days
-
-                if not time_avg.empty:
-                    time_avg['peds'] = time_avg['FUSS_IN'].fillna(0) + time_avg['FUSS_OUT'].fillna(0)
-                    time_avg['cycs'] = time_avg['VELO_IN'].fillna(0) + time_avg['VELO_OUT'].fillna(0)
-                    avg_time_peds = time_avg['peds'].iloc[0] / (1 if unit == "Hours" else 24)
-                    avg_time_cycs = time_avg['cycs'].iloc[0] / (1 if unit == "Hours" else 24)
-
-                    # Comparison sentence
-                    cycs_diff = ((avg_cyclists - avg_time_cycs) / avg_time_cycs * 100) if avg_time_cycs > 0 else 0
-                    peds_diff = ((avg_pedestrians - avg_time_peds) / avg_time_peds * 100) if avg_time_peds > 0 else 0
-                    cycs_comp = "more" if cycs_diff >= 0 else "less"
-                    peds_comp = "more" if peds_diff >= 0 else "less"
-                    comparison_text = (
-                        f"In your selected time period, {total_cyclists:,.0f} cyclists and {total_pedestrians:,.0f} pedestrians were registered. "
-                        f"This is {abs(cycs_diff):.1f}% {cycs_comp} cyclists and {abs(peds_diff):.1f}% {peds_comp} pedestrians than the average for this time of day."
-                    )
-                else:
-                    st.markdown("**Debug**: No time-of-day data available for the selected period.")
-
-                st.markdown(f"**Time-of-Day Avg. Pedestrians/Hour**: {avg_time_peds:,.1f}")
-                st.markdown(f"**Time-of-Day Avg. Cyclists/Hour**: {avg_time_cycs:,.1f}")
-                st.markdown(comparison_text)
+        window_totals = st.session_state.window_totals
+        if mobility and window_totals is not None and window_totals['rows'] > 0:
+            stats = key_statistics(window_totals, [counts_df for _, _, counts_df in mobility],
+                                   start_timestamp, duration, unit)
+            st.markdown(f"**Total Pedestrians**: {stats['total_pedestrians']:,.0f}")
+            st.markdown(f"**Total Cyclists**: {stats['total_cyclists']:,.0f}")
+            st.markdown(f"**Avg. Pedestrians/Hour**: {stats['avg_pedestrians']:,.1f}")
+            st.markdown(f"**Avg. Cyclists/Hour**: {stats['avg_cyclists']:,.1f}")
+            st.markdown(f"**Yearly Avg. Pedestrians/Hour**: {stats['avg_year_peds']:,.1f}")
+            st.markdown(f"**Yearly Avg. Cyclists/Hour**: {stats['avg_year_cycs']:,.1f}")
+            if stats['comparison_text'] is None:
+                st.markdown("**Debug**: No time-of-day data available for the selected period.")
+            st.markdown(f"**Time-of-Day Avg. Pedestrians/Hour**: {stats['avg_time_peds']:,.1f}")
+            st.markdown(f"**Time-of-Day Avg. Cyclists/Hour**: {stats['avg_time_cycs']:,.1f}")
+            st.markdown(stats['comparison_text'] or "No comparison available due to missing time-of-day data.")
         else:
             st.markdown("No mobility data available for the selected city or time range.")
 
+    # Ein Datensatz pro Rerun
+    metrics.write_run(run.finish())
+    if debug_enabled():
+        show_metrics_sidebar(run)
+
 if __name__ == "__main__":
     main()
@@ -1,4 +1,3 @@
-import pandas
 import pandas as pd
 import streamlit as st
 import os
@@ -6,14 +5,12 @@ from datetime import datetime, timedelta
 import numpy as np
 import folium
 import random
-from pyproj import Transformer
 import plotly.express as px
 
-
-def swiss_to_wgs84(easting, northing):
-    transformer = Transformer.from_crs("EPSG:2056", "EPSG:4326", always_xy=True)
-    lon, lat = transformer.transform(easting, northing)
-    return [lat, lon]
+from datastore import load_csv, load_stations
+from maplayers import CircleMarkerLayer
+from timeindex import time_index
+from weather import daily_weather_summary
 
 
 def display_map(city_coords, points, zoom=13):
@@ -24,24 +21,17 @@ def display_map(city_coords, points, zoom=13):
         attr="",
         zoom_control=False,
         scrollWheelZoom=False,
-        dragging=False
+        dragging=False,
+        prefer_canvas=True
     )
-    for point in points:
-        if isinstance(point, dict) and "coords" in point and "color" in point:
-            folium.CircleMarker(
-                location=point["coords"],
-                radius=5,
-                color=point["color"],
-                fill=True,
-                fill_color=point["color"]
-            ).add_to(m)
+    CircleMarkerLayer(points).add_to(m)
     return m
 
 
 def load_weather_data(file, file_path=None):
     try:
         if isinstance(file, str) and os.path.exists(file):
-            df = pd.read_csv(file)
+            df = load_csv(file)
         else:
             df = pd.read_csv(file)
         if df.empty or 'dt' not in df.columns:
@@ -55,46 +45,15 @@ def load_weather_data(file, file_path=None):
 
 def filter_weather_data(df, start_timestamp, duration, unit):
     if df is not None and not df.empty:
-        if unit == "Hours":
-            end_timestamp = start_timestamp + duration * 3600
-        elif unit == "Days":
-            end_timestamp = start_timestamp + duration * 86400
-        else:  # Months
-            start_date = datetime.fromtimestamp(start_timestamp)
-            end_date = (start_date + pd.offsets.MonthBegin(duration)).timestamp()
-            end_timestamp = int(end_date)
-        filtered = df[(df['dt'] >= start_timestamp) & (df['dt'] <= end_timestamp)]
-        return filtered
+        return time_index(df, 'dt').window(start_timestamp, duration, unit)
     return pd.DataFrame()
 
 
 def get_representative_weather(df, duration, unit):
     if df.empty:
         return df
-    if unit == "Months":
-        df['date'] = pd.to_datetime(df['dt'], unit='s').dt.date
-        daily = df.groupby('date').agg({
-            'temp': 'mean',
-            'humidity': 'mean',
-            'wind_speed': 'mean',
-            'weather_icon': lambda x: x.mode().iloc[0] if not x.mode().empty else x.iloc[0],
-            'weather_description': lambda x: x.mode().iloc[0] if not x.mode().empty else x.iloc[0],
-            'dt': 'first'
-        }).reset_index()
-        if len(daily) > duration:
-            indices = np.linspace(0, len(daily) - 1, duration, dtype=int)
-            daily = daily.iloc[indices]
-        return daily
-    elif unit == "Days":
-        df['date'] = pd.to_datetime(df['dt'], unit='s').dt.date
-        daily = df.groupby('date').agg({
-            'temp': 'mean',
-            'humidity': 'mean',
-            'wind_speed': 'mean',
-            'weather_icon': lambda x: x.mode().iloc[0] if not x.mode().empty else x.iloc[0],
-            'weather_description': lambda x: x.mode().iloc[0] if not x.mode().empty else x.iloc[0],
-            'dt': 'first'
-        }).reset_index()
+    if unit in ("Days", "Months"):
+        daily = daily_weather_summary(df)
         if len(daily) > duration:
             indices = np.linspace(0, len(daily) - 1, duration, dtype=int)
             daily = daily.iloc[indices]
@@ -163,10 +122,10 @@ def wind_visual(wind_speed):
     """
 
 
-def load_mobility_data(file_path):
+def load_mobility_data(file_path, loader=load_csv):
     try:
         if os.path.exists(file_path):
-            df = pd.read_csv(file_path)
+            df = loader(file_path)
             if df.empty:
                 st.error(f"No data in {file_path}.")
                 return None
@@ -195,7 +154,7 @@ def main():
     # Load mobility data
     #default_mobility_path = "arbeit/mobility/mobility_data.csv"
     default_mobility_path = "arbeit/mobility_zurich/standorte.csv"
-    zurich_points_df = pandas.read_csv(default_mobility_path)
+    zurich_points_df = load_mobility_data(default_mobility_path, loader=load_stations)
 
 
     show_weather_rain = False
@@ -242,15 +201,11 @@ def main():
             # Update points based on zurich_points_df
             st.session_state.points = []
             if zurich_points_df is not None and city in ["Zurich", "both"]:
-                for _, row in zurich_points_df.iterrows():
-                    # Extract easting and northing from geometry
-                    geom = row['geometry'].replace('POINT (', '').replace(')', '')
-                    easting, northing = map(float, geom.split())
-                    lat, lon = swiss_to_wgs84(easting, northing)
-                    st.session_state.points.append({
-                        "coords": [lat, lon],
-                        "color": f'rgba(49, 134, 204, 1)'
-                    })
+                # lat/lon are precomputed when the station table is loaded
+                st.session_state.points = [{
+                    "coords": [lat, lon],
+                    "color": f'rgba(49, 134, 204, 1)'
+                } for lat, lon in zip(zurich_points_df['lat'].tolist(), zurich_points_df['lon'].tolist())]
             elif city == "Bern":
                 # Fallback to a single point for Bern
                 city_coords = cities.get(city, cities["Bern"])
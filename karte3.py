@@ -1,16 +1,13 @@
-import zipfile
-import os
-import geopandas as gpd
 import folium
-from folium.plugins import MarkerCluster
 import pandas as pd
 import shapefile
-import shapefile
 import matplotlib.pyplot as plt
-from matplotlib.patches import Polygon
-from matplotlib.collections import PatchCollection
+from matplotlib.patches import PathPatch
+from matplotlib.collections import LineCollection, PatchCollection
+from matplotlib.path import Path as MplPath
 import numpy as np
 
+from boundaries import load_simplified, web_geometries
 
 
 def display_shapefile_contents(filepath):
@@ -51,44 +48,22 @@ def display_shapefile_contents(filepath):
 
 
 
-def extract_zip(zip_path, extract_to):
-    """
-    Extract a .zip file to a specified directory.
-
-    Args:
-        zip_path (str): Path to the .zip file
-        extract_to (str): Directory to extract files to
+def create_clickable_map(zip_path, output_html='map.html', zoom_start=10):
     """
-    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-        zip_ref.extractall(extract_to)
+    Create a clickable map from a .zip file containing shapefiles (the first .shp is used,
+    "karte.zip!gemeinden" selects a layer).
 
-
-def create_clickable_map(zip_path, output_html='map.html'):
-    """
-    Create a clickable map from a .zip file containing shapefiles.
+    The polygons come from the simplified copy that matches zoom_start (see boundaries.py),
+    shared borders stay identical between neighbours.
 
     Args:
         zip_path (str): Path to the .zip file
         output_html (str): Path to save the output HTML map
+        zoom_start (int): Initial zoom level of the map
     """
-    # Step 1: Extract the .zip file
-    extract_dir = "extracted_shapefiles"
-    if not os.path.exists(extract_dir):
-        os.makedirs(extract_dir)
-    extract_zip(zip_path, extract_dir)
-
-    # Step 2: Find and load the shapefile
-    shp_file = None
-    for file in os.listdir(extract_dir):
-        if file.endswith('.shp'):
-            shp_file = os.path.join(extract_dir, file)
-            break
-
-    if not shp_file:
-        raise FileNotFoundError("No .shp file found in the extracted directory")
-
-    # Read the shapefile using geopandas
-    gdf = gpd.read_file(shp_file)
+    # Step 1+2: Read the simplified boundaries for this zoom level straight from the archive
+    # (converted once per archive content, see boundaries.ensure_archive_store)
+    gdf = web_geometries(load_simplified(zip_path, zoom_start))
 
     # Step 3: Inspect and preprocess the GeoDataFrame
     print("Columns in GeoDataFrame:", gdf.columns.tolist())
@@ -102,11 +77,11 @@ def create_clickable_map(zip_path, output_html='map.html'):
 
     # Step 4: Create a folium map
     # Calculate the center of the map based on the geometries
-    center = gdf.geometry.centroid
-    map_center = [center.y.mean(), center.x.mean()]
+    xmin, ymin, xmax, ymax = gdf.total_bounds
+    map_center = [(ymin + ymax) / 2, (xmin + xmax) / 2]
 
     # Initialize the map
-    m = folium.Map(location=map_center, zoom_start=10)
+    m = folium.Map(location=map_center, zoom_start=zoom_start)
 
     # Step 5: Add the shapefile data to the map
     def style_function(feature):
@@ -143,91 +118,83 @@ def create_clickable_map(zip_path, output_html='map.html'):
     print(f"Map saved to {output_html}")
 
 
-def visualize_shapefile(filepath):
+def _shape_paths(points, parts):
     """
-    Opens a shapefile, displays its contents, and visualizes the geometries using matplotlib.
+    One compound matplotlib Path for all rings of a polygon shape (holes stay holes).
+    """
+    codes = np.full(len(points), MplPath.LINETO, dtype=MplPath.code_type)
+    codes[parts] = MplPath.MOVETO
+    # letzter Punkt jedes Rings schliesst ihn
+    codes[np.r_[parts[1:], len(points)] - 1] = MplPath.CLOSEPOLY
+    return MplPath(points, codes)
+
+
+def visualize_shapefile(filepath, output_png='switzerland_map.png', show_records=False):
+    """
+    Opens a shapefile and visualizes the geometries using matplotlib.
     Adjusted for large coordinates and MULTIPOLYGON shapes.
 
+    Shapes are streamed one by one (iterShapes), their points are converted to one NumPy array
+    each and all polygons / lines are drawn as a single collection.
+
     Args:
         filepath (str): Path to the .shp file
+        output_png (str): Path of the saved plot
+        show_records (bool): Also print every shape and its attributes to the console
 
     Returns:
-        None: Prints the contents and displays a plot of the shapes
+        None: Saves a plot of the shapes
     """
     try:
         # Read the shapefile
         sf = shapefile.Reader(filepath)
 
-        # Get the shapes (geometry) and records (attributes)
-        shapes = sf.shapes()
-        records = sf.records()
-        fields = sf.fields[1:]  # Skip the first field (DeletionFlag)
-
-        # Print field names (attribute names)
-        field_names = [field[0] for field in fields]
-        print("Fields (Attributes):", field_names)
-
-        # Print each shape and its corresponding record
-        for i, (shape, record) in enumerate(zip(shapes, records)):
-            print(f"\nShape {i + 1}:")
-            print("  Type:", shape.shapeTypeName)
-            print("  Points (first few):", shape.points[:5])  # Print first few points to avoid clutter
-            print("  Attributes:", dict(zip(field_names, record)))
-
-        # Set up the plot
-        fig, ax = plt.subplots(figsize=(10, 10))
-
-        # To handle large coordinates, compute the bounding box for normalization
-        all_points = []
-        for shape in shapes:
-            all_points.extend(shape.points)
-        if not all_points:
+        if show_records:
+            field_names = [field[0] for field in sf.fields[1:]]  # Skip the first field (DeletionFlag)
+            print("Fields (Attributes):", field_names)
+            for i, shape_record in enumerate(sf.iterShapeRecords()):
+                print(f"\nShape {i + 1}:")
+                print("  Type:", shape_record.shape.shapeTypeName)
+                print("  Points (first few):", shape_record.shape.points[:5])  # Print first few points to avoid clutter
+                print("  Attributes:", dict(zip(field_names, shape_record.record)))
+
+        # To handle large coordinates, normalize with the bounding box from the file header
+        if len(sf) == 0:
             raise ValueError("No points found in shapefile")
-
-        all_points = np.array(all_points)
-        min_x, min_y = all_points.min(axis=0)
-        max_x, max_y = all_points.max(axis=0)
+        min_x, min_y, max_x, max_y = sf.bbox
+        origin = np.array([min_x, min_y])
 
         # Normalize coordinates to a smaller range (e.g., 0 to 1000) for plotting
         scale_x = 1000 / (max_x - min_x) if max_x != min_x else 1
         scale_y = 1000 / (max_y - min_y) if max_y != min_y else 1
         scale = min(scale_x, scale_y)  # Use the smaller scale to preserve aspect ratio
 
-        # Plot each shape based on its type
-        patches = []
-        for shape in shapes:
-            if shape.shapeTypeName == "POINT":
-                # Plot points
-                x, y = shape.points[0]
-                x = (x - min_x) * scale
-                y = (y - min_y) * scale
-                ax.plot(x, y, 'o', color='blue',
-                        label='Point' if 'Point' not in ax.get_legend_handles_labels()[1] else "")
-
-            elif shape.shapeTypeName in ["POLYLINE", "POLYGON", "MULTIPOLYGON"]:
-                # Handle parts (for MULTIPOLYGON or POLYGON with holes)
-                parts = shape.parts
-                points = shape.points
-                if shape.shapeTypeName == "POLYLINE":
-                    # Plot lines
-                    x, y = zip(*[((pt[0] - min_x) * scale, (pt[1] - min_y) * scale) for pt in points])
-                    ax.plot(x, y, color='red',
-                            label='Polyline' if 'Polyline' not in ax.get_legend_handles_labels()[1] else "")
-                else:
-                    # Plot polygons or multipolygons
-                    for i in range(len(parts)):
-                        start = parts[i]
-                        end = parts[i + 1] if i + 1 < len(parts) else len(points)
-                        poly_points = [((pt[0] - min_x) * scale, (pt[1] - min_y) * scale) for pt in points[start:end]]
-                        if len(poly_points) > 2:  # Ensure enough points to form a polygon
-                            poly = Polygon(poly_points, closed=True, edgecolor='black', facecolor='green', alpha=0.5)
-                            patches.append(poly)
-
-        # Add polygons to the plot if any
-        if patches:
-            p = PatchCollection(patches, match_original=True)
-            ax.add_collection(p)
-            ax.set_label('Polygon')
+        # Collect the geometries by type, PolygonZ / PointM etc. are drawn like their 2D type
+        point_arrays = []
+        lines = []
+        paths = []
+        for shape in sf.iterShapes():
+            if not shape.points:
+                continue
+            points = (np.asarray(shape.points, dtype=float)[:, :2] - origin) * scale
+            kind = shape.shapeTypeName.rstrip("ZM")
+            if kind in ("POINT", "MULTIPOINT"):
+                point_arrays.append(points)
+            elif kind == "POLYLINE":
+                lines.extend(np.split(points, shape.parts[1:]))
+            elif kind in ("POLYGON", "MULTIPOLYGON"):
+                paths.append(_shape_paths(points, np.asarray(shape.parts)))
+
+        # Set up the plot
+        fig, ax = plt.subplots(figsize=(10, 10))
+        if paths:
+            ax.add_collection(PatchCollection([PathPatch(path) for path in paths], edgecolor='black',
+                                              facecolor='green', alpha=0.5, linewidths=0.3, label='Polygon'))
+        if lines:
+            ax.add_collection(LineCollection(lines, colors='red', linewidths=0.5, label='Polyline'))
+        if point_arrays:
+            points = np.concatenate(point_arrays)
+            ax.scatter(points[:, 0], points[:, 1], s=4, color='blue', label='Point')
 
         # Set equal aspect ratio to preserve shape
         ax.set_aspect('equal')
@@ -243,7 +210,8 @@ def visualize_shapefile(filepath):
         ax.set_ylim(-50, 1050)
 
         # Save the plot (Pyodide-compatible)
-        plt.savefig('switzerland_map.png')
+        plt.savefig(output_png)
+        plt.close(fig)
 
         # Close the shapefile
         sf.close()
@@ -1,34 +1,34 @@
-import geopandas as gpd
 import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
 from matplotlib.colors import ListedColormap
-import osmnx as ox
+import os
 
-# Pfade zu den Shapefiles im /karte-Ordner
-kantone_shp_path = "C:/Users/eliaw/PycharmProjects/CAS_Stat_DaVi/arbeit/karte/swissBOUNDARIES3D_1_5_TLM_KANTONSGEBIET.shp"
-gemeinden_shp_path = "C:/Users/eliaw/PycharmProjects/CAS_Stat_DaVi/arbeit/karte/swissBOUNDARIES3D_1_5_TLM_HOHEITSGEBIET.shp"
+from boundaries import boundary_dir, load_boundaries
+from osmstore import features_from_place
+
+# Ordner mit den Shapefiles: $DAVIS_BOUNDARY_DIR oder ./karte, daneben liegen die GeoParquet-Kopien (siehe boundaries.py)
+karte_dir = boundary_dir()
+# Lokaler OSM-Speicher, einmal füllen mit: python osmstore.py switzerland-latest.osm.pbf --dir <karte_dir>/osm
+# Netz nur mit DAVIS_OSM_NETWORK=1 (siehe osmstore.py)
+osm_dir = os.path.join(karte_dir, "osm")
 
 # --- Karte 2: Gemeinden im Kanton Bern mit Stadtteilen ---
-# Geodaten für Gemeinden laden (swissBOUNDARIES3D)
+# Liste von Gemeinden im Raum Bern (erweitert)
+bern_area = [
+    'Bern', 'Köniz', 'Ostermundigen', 'Muri bei Bern', 'Bolligen', 'Ittigen',
+    'Wohlen bei Bern', 'Belp', 'Kehrsatz', 'Zollikofen', 'Kirchlindach', 'Bremgarten bei Bern'
+]
+
+# Geodaten für Gemeinden laden (swissBOUNDARIES3D), nur Kanton Bern (Kantonscode 2.0) und die Liste
 try:
-    gdf = gpd.read_file(gemeinden_shp_path)
+    bern_gdf = load_boundaries("gemeinden", cantons=[2], names=bern_area, directory=karte_dir)
 except Exception as e:
     print(f"Fehler beim Laden der Gemeindedaten: {e}")
     raise
 
 # Debugging: Spalten der Gemeindedaten anzeigen
 print("\nSpalten im Gemeinden-Shapefile:")
-print(gdf.columns)
-
-# Filtere Gemeinden im Kanton Bern (Kantonscode 2.0)
-bern_gdf = gdf[gdf['KANTONSNUM'] == 2.0]
-
-# Liste von Gemeinden im Raum Bern (erweitert)
-bern_area = [
-    'Bern', 'Köniz', 'Ostermundigen', 'Muri bei Bern', 'Bolligen', 'Ittigen',
-    'Wohlen bei Bern', 'Belp', 'Kehrsatz', 'Zollikofen', 'Kirchlindach', 'Bremgarten bei Bern'
-]
-bern_gdf = bern_gdf[bern_gdf['NAME'].isin(bern_area)]
+print(bern_gdf.columns)
 
 # Debugging: Gefilterte Gemeinden anzeigen
 print("\nGefilterte Gemeinden:")
@@ -37,8 +37,9 @@ print(bern_gdf[['NAME', 'KANTONSNUM']])
 # OSM-Daten für Stadtteile in Bern und Umgebung laden
 place_name = "Bern, Switzerland"
 try:
-    # Lade Stadtteile (suburbs/neighbourhoods) aus OSM
-    stadtteile_gdf = ox.features_from_place("Bern, Switzerland", tags={'place': ['suburb', 'neighbourhood']})
+    # Lade Stadtteile (suburbs/neighbourhoods) aus dem lokalen OSM-Speicher, in LV95 wie die Gemeinden
+    stadtteile_gdf = features_from_place(place_name, tags={'place': ['suburb', 'neighbourhood']},
+                                         directory=osm_dir, boundary_directory=karte_dir).to_crs(bern_gdf.crs)
 
     # Filtere auf relevante Stadtteile (z.B. Wabern, Altstadt)
     stadtteile_gdf = stadtteile_gdf[stadtteile_gdf['name'].isin(['Wabern', 'Altstadt', 'Bümpliz', 'Bethlehem', 'Breitenrain', 'Mattenhof'])]
@@ -86,7 +87,7 @@ patches = [
 plt.legend(handles=patches, loc='upper left', fontsize=10)
 
 # Plot speichern
-output_path_bern = '/arbeit/karte/bern_gemeinden_karte.png'
+output_path_bern = os.path.join(karte_dir, 'bern_gemeinden_karte.png')
 plt.savefig(output_path_bern, bbox_inches='tight', dpi=300)
 plt.close()
 
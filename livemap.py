@@ -0,0 +1,102 @@
+"""
+Karte als eigene Streamlit-Komponente.
+
+Die Basiskarte (Kacheln, Steuerung, Pins) wird im Browser einmal aufgebaut und bleibt über die
+Reruns bestehen. Pro Rerun werden nur geänderte Punktdaten geschickt, ohne den iframe neu zu laden.
+"""
+
+import hashlib
+import html
+import json
+import os
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+from maplayers import pack_points
+
+_FRONTEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "livemap_frontend")
+_live_map = components.declare_component("live_map", path=_FRONTEND_DIR)
+
+
+def points_version(colors, rows):
+    """
+    Short content hash of packed point data.
+    """
+    payload = json.dumps([colors, rows], separators=(",", ":")).encode()
+    return hashlib.sha1(payload).hexdigest()[:16]
+
+
+def live_map(center, zoom, points, pins=None, overlay=None, regions=None, animation=None, height=600, key="karte"):
+    """
+    Shows the points on a persistent Leaflet map.
+
+    The point data is only sent when it changed since the last rerun of this session.
+    If the browser lost it (e.g. the map was hidden for a rerun) it asks for it again.
+
+    Args:
+        center (list): [lat, lon] of the map center
+        zoom (int): Zoom level
+        points (list): Marker dicts as for display_map ("coords", "color", "radius", "popup")
+        pins (list): Optional dicts with "coords" and "popup" for folium.Marker-like pins
+        overlay (dict): Optional image overlay {"url", "bounds"}, e.g. from density.density_overlay,
+            or a list of them (one per counting network). Like the points only sent when changed.
+        regions (dict): Optional GeoJSON polygons with "color" and "popup" properties,
+            e.g. from regions.region_choropleth, or a list of them. The polygons are only sent
+            when they changed, a new window only sends the colors and popups.
+        animation (dict): Optional keyframe animation from animation.animation_payload, played in the
+            browser. The frames are sent once per session, later reruns only send the final positions.
+        height (int): Height in pixels
+        key (str): Widget key, keeps the iframe alive between reruns
+
+    Returns:
+        int: Index of the last clicked point or None
+    """
+    colors, rows = pack_points(points)
+    version = points_version(colors, rows)
+    pins = [[pin["coords"][0], pin["coords"][1], html.escape(str(pin.get("popup", "")))] for pin in (pins or [])]
+    overlays = [item for item in (overlay if isinstance(overlay, list) else [overlay]) if item]
+    regions = [item for item in (regions if isinstance(regions, list) else [regions]) if item]
+
+    overlay_version = points_version([], overlays)
+    # Polygone und Farben/Popups getrennt: die Polygone bleiben über die Zeitfenster gleich
+    region_styles = [[[feature["properties"].get("color"), feature["properties"].get("popup", "")]
+                      for feature in collection["features"]] for collection in regions]
+    regions = [{"type": "FeatureCollection",
+                "features": [{"type": "Feature", "geometry": feature["geometry"], "properties": {}}
+                             for feature in collection["features"]]} for collection in regions]
+    regions_version = points_version([], regions)
+
+    sent_key = f"_live_map_sent_{key}"
+    overlay_key = f"_live_map_overlay_{key}"
+    regions_key = f"_live_map_regions_{key}"
+    value = st.session_state.get(key) or {}
+    fresh = value.get("nonce") != st.session_state.get(f"{sent_key}_nonce")
+    resend = fresh and value.get("missing") == version
+    resend_overlays = fresh and value.get("missing_overlays") == overlay_version
+    resend_regions = fresh and value.get("missing_regions") == regions_version
+    if resend or resend_overlays or resend_regions:
+        st.session_state[f"{sent_key}_nonce"] = value.get("nonce")
+
+    if st.session_state.get(sent_key) == version and not resend:
+        colors, rows = None, None
+    st.session_state[sent_key] = version
+    # Overlays (z.B. PNG-Data-URLs des Dichte-Rasters) ebenfalls nur bei Änderung schicken
+    if st.session_state.get(overlay_key) == overlay_version and not resend_overlays:
+        overlays = None
+    st.session_state[overlay_key] = overlay_version
+    if st.session_state.get(regions_key) == regions_version and not resend_regions:
+        regions = None
+    st.session_state[regions_key] = regions_version
+
+    if animation:
+        animation_key = f"_live_map_animation_{key}"
+        if st.session_state.get(animation_key) == animation["version"]:
+            animation = {k: v for k, v in animation.items() if k != "frames"}
+        st.session_state[animation_key] = animation["version"]
+
+    value = _live_map(center=list(center), zoom=zoom, colors=colors, rows=rows, pins=pins, overlays=overlays,
+                      regions=regions, region_styles=region_styles, animation=animation, version=version,
+                      overlay_version=overlay_version, regions_version=regions_version,
+                      height=height, key=key, default=None)
+    return value.get("clicked") if isinstance(value, dict) else None
@@ -0,0 +1,293 @@
+"""
+Stapel-Export statischer Karten (PNG / SVG) aus einer Liste von Kartenbeschreibungen.
+
+Die Grenzen werden einmal im Hauptprozess geladen (vereinfachte Kopie passend zur Auflösung,
+siehe boundaries.py) und mit den Worker-Prozessen geteilt: unter Linux per fork ohne Kopie,
+sonst einmal pro Worker beim Start. Jeder Worker zeichnet danach nur noch Karten.
+
+Eine Kartenbeschreibung ist ein dict, z.B.
+    {"kind": "cantons", "output": "schweiz_kantone_karte.png"}
+    {"kind": "canton", "canton": 2, "names": ["Bern", "Köniz"], "highlight": "Bern", "output": "bern.svg"}
+    {"kind": "traffic", "month": "2023-05", "counts": "mobility_zurich/zurich_mobility.csv", "output": "zh_05.png"}
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import matplotlib.patches as mpatches
+from matplotlib.colors import ListedColormap
+import numpy as np
+import pandas as pd
+from shapely.geometry import box
+
+from boundaries import level_for_zoom, load_simplified
+
+FORMATS = ("png", "svg")
+DEFAULT_DPI = 300
+FIGSIZE = (12, 10)
+# Zoomstufe der vereinfachten Grenzen je Kartenart (ca. ein Pixel bei 300 dpi)
+DEFAULT_ZOOM = {"cantons": 10, "canton": 12, "traffic": 14}
+LAYER_OF_KIND = {"cantons": "kantone", "canton": "gemeinden", "traffic": "gemeinden"}
+
+# Liste von Hex-Farbcodes für die 26 Kantone
+CANTON_COLORS = [
+    '#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b',
+    '#e377c2', '#7f7f7f', '#bcbd22', '#17becf', '#aec7e8', '#ffbb78',
+    '#98df8a', '#ff9896', '#c5b0d5', '#c49c94', '#f7b6d2', '#c7c7c7',
+    '#dbdb8d', '#9edae5', '#393b79', '#637939', '#8c6d31', '#843c39',
+    '#7b4173', '#5254a3'
+]
+HIGHLIGHT_COLORS = ['#ff4d4d', '#99ccff']  # Rot für die hervorgehobene, Blau für andere Gemeinden
+
+# (Ebene, Stufe) -> GeoDataFrame, im Worker geerbt oder von _init_worker gesetzt
+_layers = {}
+
+
+def _init_worker(layers):
+    _layers.update(layers)
+
+
+def _layer(spec):
+    layer = LAYER_OF_KIND[spec["kind"]]
+    return _layers[(layer, level_for_zoom(spec.get("zoom", DEFAULT_ZOOM[spec["kind"]])))]
+
+
+def load_layers(specs, directory=None):
+    """
+    Loads every (layer, simplification level) the specs need, once.
+    """
+    layers = {}
+    for spec in specs:
+        layer = LAYER_OF_KIND[spec["kind"]]
+        key = (layer, level_for_zoom(spec.get("zoom", DEFAULT_ZOOM[spec["kind"]])))
+        if key not in layers:
+            layers[key] = load_simplified(layer, key[1], directory=directory)
+    return layers
+
+
+def _labels(ax, gdf, fontsize=8, color='black'):
+    points = gdf.geometry.representative_point()
+    for x, y, name in zip(points.x, points.y, gdf['NAME']):
+        ax.text(x, y, name, fontsize=fontsize, ha='center', va='center', color=color,
+                bbox=dict(facecolor='white', alpha=0.7, edgecolor='none'))
+
+
+def _axis_labels(ax, title):
+    ax.set_title(title, fontsize=16, pad=10)
+    ax.set_xlabel('Längengrad (CH1903+ / LV95)', fontsize=12)
+    ax.set_ylabel('Breitengrad (CH1903+ / LV95)', fontsize=12)
+
+
+def render_cantons(spec, ax):
+    """
+    All cantons of Switzerland, one color each (like karte.py).
+    """
+    kantone = _layer(spec)
+    kantone.plot(column='NAME', cmap=ListedColormap(CANTON_COLORS[:len(kantone)]), linewidth=0.8,
+                 edgecolor='black', legend=False, ax=ax)
+    _axis_labels(ax, spec.get("title", 'Kantone der Schweiz'))
+    # Legende in der Reihenfolge der Farben (wie bei column='NAME' sortiert)
+    names = np.sort(kantone['NAME'].unique())
+    patches = [mpatches.Patch(color=CANTON_COLORS[i], label=name) for i, name in enumerate(names)]
+    ax.legend(handles=patches, loc='upper left', fontsize=8, title='Kantone')
+
+
+def render_canton(spec, ax):
+    """
+    Municipalities of one canton (optionally only `names`), `highlight` in red.
+    """
+    gemeinden = _layer(spec)
+    subset = gemeinden[gemeinden['KANTONSNUM'] == float(spec["canton"])]
+    if spec.get("names"):
+        subset = subset[subset['NAME'].isin(spec["names"])]
+    highlight = spec.get("highlight")
+    is_highlight = (subset['NAME'] == highlight).to_numpy()
+    colors = np.where(is_highlight, HIGHLIGHT_COLORS[0], HIGHLIGHT_COLORS[1])
+    subset.plot(color=colors, linewidth=0.8 if len(subset) < 100 else 0.3, edgecolor='black', ax=ax)
+    if spec.get("labels", len(subset) <= 60):
+        _labels(ax, subset)
+    _axis_labels(ax, spec.get("title", f"Gemeinden im Kanton {spec.get('canton_name', spec['canton'])}"))
+    if highlight:
+        patches = [mpatches.Patch(color=HIGHLIGHT_COLORS[0], label=highlight),
+                   mpatches.Patch(color=HIGHLIGHT_COLORS[1], label='Andere Gemeinden')]
+        ax.legend(handles=patches, loc='upper left', fontsize=10)
+
+
+def render_traffic(spec, ax):
+    """
+    Traffic of one month: municipalities colored by the summed station traffic, stations as dots.
+
+    spec["stations"] holds the station totals (OST, NORD, total), see add_station_totals.
+    """
+    from regions import StationRegions
+
+    stations = spec["stations"]
+    easting = np.asarray(stations["OST"], dtype=float)
+    northing = np.asarray(stations["NORD"], dtype=float)
+    total = np.asarray(stations["total"], dtype=float)
+    gemeinden = _layer(spec)
+    area = box(np.nanmin(easting), np.nanmin(northing), np.nanmax(easting), np.nanmax(northing))
+    subset = gemeinden.iloc[sorted(gemeinden.sindex.query(area, predicate="intersects"))]
+
+    regions = StationRegions(easting, northing, subset)
+    # pro Polygon-Zeile, gleichnamige Polygone (Exklaven) bleiben getrennt
+    traffic = np.zeros(len(subset))
+    traffic[regions.rows] = regions.aggregate(total[:, None])[:, 0]
+    subset = subset.assign(traffic=traffic)
+    subset.plot(column='traffic', cmap='coolwarm', linewidth=0.5, edgecolor='black', legend=True, ax=ax,
+                legend_kwds={'label': 'Velo + Fuss', 'shrink': 0.6})
+    sizes = 5 + 95 * total / total.max() if total.max() > 0 else np.full(len(total), 5.0)
+    ax.scatter(easting, northing, s=sizes, color='black', alpha=0.6)
+    _axis_labels(ax, spec.get("title", f"Verkehr {spec['month']}"))
+
+
+RENDERERS = {"cantons": render_cantons, "canton": render_canton, "traffic": render_traffic}
+
+
+def render(spec):
+    """
+    Renders one spec into its output file (format from spec["format"] or the file extension).
+
+    Returns:
+        tuple: (output path, seconds)
+    """
+    start = time.perf_counter()
+    output = spec["output"]
+    fmt = spec.get("format") or os.path.splitext(output)[1].lstrip(".") or "png"
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format {fmt}, use one of {FORMATS}")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    fig, ax = plt.subplots(figsize=spec.get("figsize", FIGSIZE))
+    try:
+        RENDERERS[spec["kind"]](spec, ax)
+        fig.savefig(output, format=fmt, bbox_inches='tight', dpi=spec.get("dpi", DEFAULT_DPI))
+    finally:
+        plt.close(fig)
+    return output, time.perf_counter() - start
+
+
+def add_station_totals(specs):
+    """
+    Attaches the monthly station totals to the traffic specs, each counts file is read once.
+    """
+    from datastore import normalize_counts
+    from rollup import COUNT_COLUMNS, TrafficCube
+
+    counts = {}
+    cubes = {}
+    for spec in specs:
+        if spec["kind"] != "traffic" or "stations" in spec:
+            continue
+        if spec["counts"] not in cubes:
+            # der Frame muss leben, solange der Würfel Randstunden daraus liest
+            counts[spec["counts"]] = normalize_counts(pd.read_csv(spec["counts"]))
+            cubes[spec["counts"]] = TrafficCube(counts[spec["counts"]])
+        cube = cubes[spec["counts"]]
+        # Monatsgrenzen in UTC wie DATUM_TS, unabhängig von der Zeitzone der Maschine
+        start = pd.Timestamp(f"{spec['month']}-01", tz="UTC")
+        end = start + pd.offsets.MonthBegin(1)
+        totals = cube.station_totals(int(start.timestamp()), int(end.timestamp()) - 1)
+        spec["stations"] = {
+            "OST": cube.stations['OST'].tolist(),
+            "NORD": cube.stations['NORD'].tolist(),
+            "total": totals[:, :len(COUNT_COLUMNS)].sum(axis=1).tolist()
+        }
+    return specs
+
+
+def canton_specs(kantone, out_dir, formats=("png",)):
+    """
+    One municipality map per canton (26 specs per format).
+    """
+    cantons = kantone.drop_duplicates('KANTONSNUM').sort_values('KANTONSNUM')
+    return [{"kind": "canton", "canton": int(num), "canton_name": name,
+             "output": os.path.join(out_dir, f"kanton_{int(num):02d}.{fmt}")}
+            for num, name in zip(cantons['KANTONSNUM'], cantons['NAME']) for fmt in formats]
+
+
+def traffic_specs(counts_path, year, out_dir, formats=("png",)):
+    """
+    One traffic map per month of a year.
+    """
+    return [{"kind": "traffic", "counts": counts_path, "month": f"{year}-{month:02d}",
+             "output": os.path.join(out_dir, f"verkehr_{year}_{month:02d}.{fmt}")}
+            for month in range(1, 13) for fmt in formats]
+
+
+def export_maps(specs, workers=None, directory=None):
+    """
+    Renders all specs across a process pool.
+
+    Args:
+        specs (list): Map specs (see module docstring)
+        workers (int): Number of processes, default os.cpu_count(), 1 renders in this process
+        directory (str): Folder with the swissBOUNDARIES3D files, default $DAVIS_BOUNDARY_DIR or "karte"
+
+    Returns:
+        list: (output path, seconds) per spec, in order of completion
+    """
+    specs = add_station_totals([dict(spec) for spec in specs])
+    layers = load_layers(specs, directory)
+    workers = min(workers or os.cpu_count() or 1, len(specs))
+    if workers <= 1:
+        _init_worker(layers)
+        return [render(spec) for spec in specs]
+
+    methods = multiprocessing.get_all_start_methods()
+    if "fork" in methods:
+        # Kinder erben die geladenen Grenzen, nichts wird kopiert
+        _init_worker(layers)
+        pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("fork"))
+    else:
+        pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(layers,))
+    results = []
+    with pool:
+        futures = {pool.submit(render, spec): spec for spec in specs}
+        for future in as_completed(futures):
+            results.append(future.result())
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Statische Karten als PNG/SVG im Stapel exportieren")
+    parser.add_argument('specs', nargs='?', help="JSON-Datei mit einer Liste von Kartenbeschreibungen")
+    parser.add_argument('--cantons', action='store_true', help="Gemeindekarte für jeden Kanton")
+    parser.add_argument('--overview', action='store_true', help="Schweiz mit allen Kantonen")
+    parser.add_argument('--traffic', help="Zähldaten-CSV für eine Verkehrskarte pro Monat")
+    parser.add_argument('--year', type=int, default=2023)
+    parser.add_argument('--format', nargs='+', default=['png'], choices=FORMATS)
+    parser.add_argument('--out', default='export', help="Zielordner")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--boundaries', help="Ordner mit den swissBOUNDARIES3D-Dateien")
+    args = parser.parse_args()
+
+    specs = []
+    if args.specs:
+        with open(args.specs, encoding="utf-8") as f:
+            specs += json.load(f)
+    if args.overview:
+        specs += [{"kind": "cantons", "output": os.path.join(args.out, f"schweiz_kantone_karte.{fmt}")}
+                  for fmt in args.format]
+    if args.cantons:
+        specs += canton_specs(load_simplified("kantone", DEFAULT_ZOOM["cantons"], columns=['NAME', 'KANTONSNUM'],
+                                              directory=args.boundaries), args.out, args.format)
+    if args.traffic:
+        specs += traffic_specs(args.traffic, args.year, args.out, args.format)
+    if not specs:
+        parser.error("no maps selected (specs file, --overview, --cantons or --traffic)")
+
+    start = time.perf_counter()
+    for output, seconds in export_maps(specs, args.workers, args.boundaries):
+        print(f"{output}: {seconds:.1f} s")
+    print(f"{len(specs)} maps in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Folium-Layer für viele Punkte.
+
+Statt einem folium.CircleMarker (und einem eigenen JS-Block) pro Punkt werden alle Punkte als
+ein kompaktes Array serialisiert und im Browser mit einem gemeinsamen Canvas-Renderer gezeichnet.
+"""
+
+import html
+
+from branca.element import MacroElement
+from jinja2 import Template
+
+DEFAULT_COLOR = '#3186cc'
+DEFAULT_RADIUS = 5
+
+
+def pack_points(points, precision=5):
+    """
+    Packs marker dicts into a color table and one row per point.
+
+    Args:
+        points (list): Dicts with "coords" [lat, lon], "color" and optional "radius" / "popup"
+        precision (int): Decimal places of the coordinates (5 ~ 1 m)
+
+    Returns:
+        tuple: (colors, rows) with rows as [lat, lon, radius, color index, popup], popups HTML-escaped
+    """
+    colors = []
+    color_ids = {}
+    rows = []
+    for point in points:
+        if not (isinstance(point, dict) and "coords" in point and "color" in point):
+            continue
+        color = point["color"]
+        if color not in color_ids:
+            color_ids[color] = len(colors)
+            colors.append(color)
+        lat, lon = point["coords"]
+        rows.append([
+            round(float(lat), precision),
+            round(float(lon), precision),
+            round(float(point.get("radius", DEFAULT_RADIUS)), 1),
+            color_ids[color],
+            # Leaflet setzt Popups als HTML ein, Namen aus den Daten nur als Text
+            html.escape(str(point.get("popup", "")))
+        ])
+    return colors, rows
+
+
+class CircleMarkerLayer(MacroElement):
+    """
+    All points of a map as one layer of canvas circle markers.
+
+    Style is data driven: color, radius and popup per point, same defaults as folium.CircleMarker
+    with fill=True.
+    """
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = (function() {
+                var renderer = L.canvas({padding: 0.5});
+                var colors = {{ this.colors|tojson }};
+                var rows = {{ this.rows|tojson }};
+                var layer = L.layerGroup();
+                for (var i = 0; i < rows.length; i++) {
+                    var row = rows[i];
+                    var color = colors[row[3]];
+                    var marker = L.circleMarker([row[0], row[1]], {
+                        renderer: renderer, radius: row[2], color: color,
+                        fill: true, fillColor: color, fillOpacity: 0.2, weight: 3
+                    });
+                    if (row[4]) {
+                        marker.bindPopup(row[4]);
+                    }
+                    layer.addLayer(marker);
+                }
+                return layer.addTo({{ this._parent.get_name() }});
+            })();
+        {% endmacro %}
+        """
+    )
+
+    def __init__(self, points):
+        super().__init__()
+        self._name = "CircleMarkerLayer"
+        self.colors, self.rows = pack_points(points)
@@ -0,0 +1,193 @@
+"""
+Zeitmessung und Zähler pro Rerun.
+
+Jeder Streamlit-Rerun läuft in einem eigenen Thread, deshalb hat jeder Thread seinen eigenen
+laufenden Datensatz. Stufen werden mit `stage(...)` gemessen, Cache-Treffer mit `cache_hit`/
+`cache_miss` gezählt. Mit der Umgebungsvariable DAVIS_METRICS_FILE wird pro Rerun ein
+Datensatz geschrieben (.prom -> Prometheus-Textformat, sonst JSON lines).
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_FILE_ENV = "DAVIS_METRICS_FILE"
+
+_local = threading.local()
+_totals_lock = threading.Lock()
+_cache_totals = {}
+_write_lock = threading.Lock()
+
+
+class RunRecord:
+    """
+    Timings and counters of one rerun.
+    """
+
+    def __init__(self, session=None):
+        self.session = session
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.stages = {}
+        self.caches = {}
+        self.seconds = None
+
+    def add_stage(self, name, seconds, rows=None):
+        entry = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0, "rows": None})
+        entry["seconds"] += seconds
+        entry["calls"] += 1
+        if rows is not None:
+            entry["rows"] = (entry["rows"] or 0) + int(rows)
+
+    def add_cache(self, cache, result):
+        entry = self.caches.setdefault(cache, {"hit": 0, "miss": 0})
+        entry[result] += 1
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self._start
+        return self
+
+    def to_dict(self):
+        return {
+            "time": self.started,
+            "session": self.session,
+            "seconds": self.seconds,
+            "stages": self.stages,
+            "caches": self.caches
+        }
+
+
+def start_run(session=None):
+    """
+    Starts a new record for the current thread (one per rerun) and returns it.
+    """
+    _local.run = RunRecord(session)
+    return _local.run
+
+
+def current_run():
+    return getattr(_local, "run", None)
+
+
+class _Stage:
+    def __init__(self):
+        self.rows = None
+
+
+@contextmanager
+def stage(name, rows=None):
+    """
+    Measures the wall time of a block, set `.rows` on the yielded object to record processed rows.
+
+    Without a running record (e.g. in scripts) this only costs two perf_counter calls.
+    """
+    info = _Stage()
+    info.rows = rows
+    start = time.perf_counter()
+    try:
+        yield info
+    finally:
+        run = current_run()
+        if run is not None:
+            run.add_stage(name, time.perf_counter() - start, info.rows)
+
+
+def _count_cache(cache, result):
+    run = current_run()
+    if run is not None:
+        run.add_cache(cache, result)
+    with _totals_lock:
+        entry = _cache_totals.setdefault(cache, {"hit": 0, "miss": 0})
+        entry[result] += 1
+
+
+def cache_hit(cache):
+    _count_cache(cache, "hit")
+
+
+def cache_miss(cache):
+    _count_cache(cache, "miss")
+
+
+@contextmanager
+def cache_lookup(cache):
+    """
+    Counts a lookup in a cache whose miss path calls cache_miss(cache) itself.
+
+    Used for st.cache_resource functions: only the miss executes the function body,
+    so a lookup without a miss inside is a hit.
+    """
+    misses = _local.__dict__.setdefault("misses", {})
+    before = misses.get(cache, 0)
+    yield
+    if misses.get(cache, 0) == before:
+        cache_hit(cache)
+
+
+def record_miss(cache):
+    """
+    cache_miss for use inside cached function bodies, see cache_lookup.
+    """
+    misses = _local.__dict__.setdefault("misses", {})
+    misses[cache] = misses.get(cache, 0) + 1
+    cache_miss(cache)
+
+
+def cache_totals():
+    """
+    Process-wide hit/miss counts per cache since the server started.
+    """
+    with _totals_lock:
+        return {cache: dict(entry) for cache, entry in _cache_totals.items()}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def to_prometheus(run):
+    """
+    Prometheus text exposition of the last run plus process-wide cache counters.
+    """
+    lines = [
+        "# HELP davis_rerun_seconds Wall time of the last rerun.",
+        "# TYPE davis_rerun_seconds gauge",
+        f"davis_rerun_seconds {run.seconds or 0:.6f}",
+        "# HELP davis_stage_seconds Wall time per stage in the last rerun.",
+        "# TYPE davis_stage_seconds gauge"
+    ]
+    for name, entry in run.stages.items():
+        lines.append(f'davis_stage_seconds{{stage="{_escape(name)}"}} {entry["seconds"]:.6f}')
+    lines += ["# HELP davis_stage_rows Rows processed per stage in the last rerun.",
+              "# TYPE davis_stage_rows gauge"]
+    for name, entry in run.stages.items():
+        if entry["rows"] is not None:
+            lines.append(f'davis_stage_rows{{stage="{_escape(name)}"}} {entry["rows"]}')
+    lines += ["# HELP davis_cache_lookups_total Cache lookups since server start.",
+              "# TYPE davis_cache_lookups_total counter"]
+    for cache, entry in sorted(cache_totals().items()):
+        for result in ("hit", "miss"):
+            lines.append(f'davis_cache_lookups_total{{cache="{_escape(cache)}",result="{result}"}} {entry[result]}')
+    return "\n".join(lines) + "\n"
+
+
+def write_run(run, path=None):
+    """
+    Writes a finished run to path (default: $DAVIS_METRICS_FILE), nothing if no path is set.
+
+    JSON lines are appended, a .prom file is replaced atomically (node_exporter textfile style).
+    """
+    path = path or os.environ.get(METRICS_FILE_ENV)
+    if not path:
+        return
+    with _write_lock:
+        if path.endswith(".prom"):
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(to_prometheus(run))
+            os.replace(tmp_path, path)
+        else:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(run.to_dict()) + "\n")
@@ -0,0 +1,325 @@
+"""
+Lokaler Speicher für OSM-Objekte (Stadtteile, Quartiere, ...) statt ox.features_from_place.
+
+Der Speicher wird einmal aus einem heruntergeladenen Extrakt (.osm.pbf / .osm, gelesen mit dem
+OSM-Treiber von GDAL) gefüllt. Pro Tag-Schlüssel (z.B. 'place') gibt es eine GeoParquet-Datei,
+sortiert nach Wert und Hilbert-Kurve, mit bbox-Spalten wie im Grenzen-Speicher (boundaries.py).
+Abfragen lesen nur die passenden Row-Groups. Das Netz (osmnx) wird nur verwendet, wenn es
+ausdrücklich erlaubt ist; das Ergebnis landet dann ebenfalls im Speicher.
+"""
+
+import argparse
+import json
+import os
+import re
+
+import geopandas as gpd
+import pandas as pd
+import shapely
+from shapely.geometry import box
+
+OSM_DIR_ENV = "DAVIS_OSM_DIR"
+DEFAULT_OSM_DIR = os.path.join("karte", "osm")
+NETWORK_ENV = "DAVIS_OSM_NETWORK"
+EXTRACT_LAYERS = ("points", "lines", "multilinestrings", "multipolygons")
+DEFAULT_KEYS = ("place",)
+ROW_GROUP_SIZE = 256
+COVERAGE_FILE = "coverage.json"
+PLACES_FILE = "places.parquet"
+CRS = "EPSG:4326"
+
+# Spalten des GDAL-OSM-Treibers, die keine Tags sind
+_DRIVER_COLUMNS = {"osm_id", "osm_way_id", "other_tags", "geometry"}
+_HSTORE = re.compile(r'"((?:[^"\\]|\\.)*)"=>"((?:[^"\\]|\\.)*)"')
+
+
+def osm_dir(directory=None):
+    return directory or os.environ.get(OSM_DIR_ENV, DEFAULT_OSM_DIR)
+
+
+def network_allowed(allow_network=None):
+    """
+    Network fallback only if passed explicitly or DAVIS_OSM_NETWORK=1.
+    """
+    if allow_network is not None:
+        return allow_network
+    return os.environ.get(NETWORK_ENV, "") == "1"
+
+
+def key_path(key, directory=None):
+    return os.path.join(osm_dir(directory), f"{key}.parquet")
+
+
+def _read_json(path, default):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def _write_json(path, value):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(value, f)
+    os.replace(tmp_path, path)
+
+
+def _parse_hstore(text):
+    if not isinstance(text, str):
+        return {}
+    return {k.replace('\\"', '"'): v.replace('\\"', '"') for k, v in _HSTORE.findall(text)}
+
+
+def read_extract(path):
+    """
+    Reads the points, lines and (multi)polygons of an OSM extract into one frame.
+
+    Returns:
+        gpd.GeoDataFrame: element ('node', 'way', 'relation'), osmid, name, tags (JSON) and geometry in WGS84
+    """
+    parts = []
+    for layer in EXTRACT_LAYERS:
+        gdf = gpd.read_file(path, layer=layer)
+        if gdf.empty:
+            continue
+        tag_columns = [col for col in gdf.columns if col not in _DRIVER_COLUMNS]
+        records = gdf[tag_columns].to_dict("records")
+        other = gdf["other_tags"] if "other_tags" in gdf.columns else [None] * len(gdf)
+        tags = [dict({k: v for k, v in record.items() if isinstance(v, str) and v}, **_parse_hstore(extra))
+                for record, extra in zip(records, other)]
+        if layer == "multipolygons":
+            # Flächen aus geschlossenen Wegen haben osm_way_id, solche aus Relationen osm_id
+            way_id = pd.to_numeric(gdf["osm_way_id"], errors="coerce")
+            element = way_id.notna().map({True: "way", False: "relation"})
+            osmid = way_id.fillna(pd.to_numeric(gdf["osm_id"], errors="coerce"))
+        else:
+            element = pd.Series({"points": "node", "lines": "way"}.get(layer, "relation"), index=gdf.index)
+            osmid = pd.to_numeric(gdf["osm_id"], errors="coerce")
+        parts.append(gpd.GeoDataFrame({
+            "element": element.to_numpy(),
+            "osmid": osmid.astype("int64").to_numpy(),
+            "name": [tag.get("name") for tag in tags],
+            "tags": [json.dumps(tag, ensure_ascii=False, sort_keys=True) for tag in tags]
+        }, geometry=gdf.geometry.to_numpy(), crs=gdf.crs))
+    if not parts:
+        return gpd.GeoDataFrame({"element": [], "osmid": [], "name": [], "tags": []}, geometry=[], crs=CRS)
+    return pd.concat(parts, ignore_index=True).to_crs(CRS)
+
+
+def seed_features(features, keys=DEFAULT_KEYS, coverage=None, directory=None):
+    """
+    Adds features (see read_extract) to the store, one file per tag key.
+
+    Args:
+        features (gpd.GeoDataFrame): element, osmid, name, tags (JSON), geometry
+        keys (tuple): Tag keys to keep, e.g. ("place", "boundary")
+        coverage (tuple): WGS84 (xmin, ymin, xmax, ymax) or polygon the features are complete for,
+            default: their total bounds
+        directory (str): Store folder, default $DAVIS_OSM_DIR or "karte/osm"
+    """
+    directory = osm_dir(directory)
+    os.makedirs(directory, exist_ok=True)
+    features = features.to_crs(CRS)
+    if coverage is None and not features.empty:
+        coverage = tuple(float(v) for v in features.total_bounds)
+    tags = features["tags"].map(json.loads)
+
+    covered = _read_json(os.path.join(directory, COVERAGE_FILE), {})
+    for key in keys:
+        value = tags.map(lambda tag: tag.get(key))
+        subset = features[value.notna().to_numpy()].assign(value=value[value.notna()].to_numpy())
+        path = key_path(key, directory)
+        if os.path.exists(path):
+            # neue Objekte ersetzen gleiche (element, osmid) aus früheren Extrakten
+            subset = pd.concat([subset, gpd.read_parquet(path).drop(columns=["bbox"], errors="ignore")])
+            subset = subset.drop_duplicates(["element", "osmid"], keep="first")
+        subset = subset.reset_index(drop=True)
+        if not subset.empty:
+            order = pd.DataFrame({"value": subset["value"].to_numpy(),
+                                  "hilbert": subset.geometry.hilbert_distance(total_bounds=(-180, -90, 180, 90))})
+            subset = subset.iloc[order.sort_values(["value", "hilbert"], kind="stable").index].reset_index(drop=True)
+        tmp_path = f"{path}.tmp"
+        subset.to_parquet(tmp_path, index=False, write_covering_bbox=True, row_group_size=ROW_GROUP_SIZE)
+        os.replace(tmp_path, path)
+        if coverage is not None:
+            covered.setdefault(key, []).append(shapely.to_wkt(_area(coverage), rounding_precision=-1))
+    _write_json(os.path.join(directory, COVERAGE_FILE), covered)
+
+
+def seed_from_extract(path, keys=DEFAULT_KEYS, directory=None, bounds=None):
+    """
+    Fills the store from a downloaded extract (e.g. switzerland-latest.osm.pbf from Geofabrik).
+
+    bounds (WGS84 xmin, ymin, xmax, ymax) is the area the extract was cut to, default:
+    the bounds of its features.
+    """
+    seed_features(read_extract(path), keys, coverage=bounds, directory=directory)
+
+
+def _area(area):
+    # (xmin, ymin, xmax, ymax), WKT (coverage.json) oder Geometrie
+    if isinstance(area, str):
+        return shapely.from_wkt(area)
+    if isinstance(area, (list, tuple)):
+        return box(*area)
+    return area
+
+
+def is_covered(key, area, directory=None):
+    """
+    True if the store holds everything with `key` inside area, a WGS84 (xmin, ymin, xmax, ymax)
+    or polygon, i.e. the extracts and fetches recorded for `key` together contain it.
+    """
+    covered = _read_json(os.path.join(osm_dir(directory), COVERAGE_FILE), {}).get(key, [])
+    if not covered:
+        return False
+    return bool(shapely.union_all([_area(entry) for entry in covered]).covers(_area(area)))
+
+
+def _tag_values(tags, key):
+    # wie osmnx: True = jeder Wert, sonst ein Wert oder eine Liste
+    values = tags[key]
+    if values is True:
+        return None
+    return [values] if isinstance(values, str) else list(values)
+
+
+def features_from_polygon(polygon, tags, directory=None):
+    """
+    Features with any of the tags inside a WGS84 polygon, from the store only.
+
+    Returns:
+        gpd.GeoDataFrame: Index (element, osmid), name, one column per queried tag key, geometry
+    """
+    parts = []
+    for key in tags:
+        path = key_path(key, directory)
+        if not os.path.exists(path):
+            continue
+        values = _tag_values(tags, key)
+        filters = [("value", "in", values)] if values is not None else None
+        gdf = gpd.read_parquet(path, bbox=polygon.bounds, filters=filters).drop(columns=["bbox"], errors="ignore")
+        if len(gdf):
+            gdf = gdf.iloc[sorted(gdf.sindex.query(polygon, predicate="intersects"))]
+        parts.append(gdf)
+    if not parts or all(part.empty for part in parts):
+        result = gpd.GeoDataFrame({"element": [], "osmid": [], "name": [], "tags": []}, geometry=[], crs=CRS)
+    else:
+        result = pd.concat([part for part in parts if not part.empty]).drop_duplicates(["element", "osmid"])
+    # Tag-Spalten wie bei osmnx
+    tag_dicts = result["tags"].map(json.loads)
+    for key in tags:
+        result[key] = tag_dicts.map(lambda tag: tag.get(key)).to_numpy()
+    result = result.drop(columns=["tags", "value"], errors="ignore").sort_values(["element", "osmid"])
+    return result.set_index(["element", "osmid"])
+
+
+def _cached_place(place, directory):
+    path = os.path.join(osm_dir(directory), PLACES_FILE)
+    if not os.path.exists(path):
+        return None
+    places = gpd.read_parquet(path, filters=[("place", "==", place)])
+    return places.geometry.iloc[0] if len(places) else None
+
+
+def register_place(place, geometry, directory=None):
+    """
+    Stores the polygon of a place name (WGS84) for offline place queries.
+    """
+    directory = osm_dir(directory)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, PLACES_FILE)
+    places = gpd.GeoDataFrame({"place": [place]}, geometry=[geometry], crs=CRS)
+    if os.path.exists(path):
+        places = pd.concat([places, gpd.read_parquet(path)]).drop_duplicates("place", keep="first")
+    places.to_parquet(path, index=False)
+
+
+def place_polygon(place, directory=None, allow_network=None, boundary_directory=None):
+    """
+    WGS84 polygon of a place name like "Bern, Switzerland".
+
+    Looked up in the registered places, then in the swissBOUNDARIES3D municipalities
+    (name before the comma), and only with network permission geocoded with osmnx.
+    """
+    polygon = _cached_place(place, directory)
+    if polygon is not None:
+        return polygon
+    try:
+        from boundaries import load_boundaries
+        municipality = load_boundaries("gemeinden", names=[place.split(",")[0].strip()], columns=["NAME"],
+                                       directory=boundary_directory)
+    except (FileNotFoundError, OSError):
+        municipality = None
+    if municipality is not None and len(municipality):
+        polygon = municipality.to_crs(CRS).union_all()
+    elif network_allowed(allow_network):
+        import osmnx as ox
+        polygon = ox.geocode_to_gdf(place).to_crs(CRS).union_all()
+    else:
+        raise FileNotFoundError(f"Unknown place '{place}' (register_place or allow the network)")
+    register_place(place, polygon, directory)
+    return polygon
+
+
+def _from_osmnx(gdf):
+    # osmnx-Ergebnis (Index element/id, eine Spalte pro Tag) ins Speicherformat
+    gdf = gdf.reset_index()
+    id_column = "osmid" if "osmid" in gdf.columns else "id"
+    tag_columns = [col for col in gdf.columns if col not in ("element", id_column, "geometry", "nodes", "ways")]
+    records = gdf[tag_columns].to_dict("records")
+    tags = [{k: str(v) for k, v in record.items() if isinstance(v, (str, int, float)) and not pd.isna(v)}
+            for record in records]
+    return gpd.GeoDataFrame({
+        "element": gdf["element"].to_numpy(),
+        "osmid": gdf[id_column].astype("int64").to_numpy(),
+        "name": [tag.get("name") for tag in tags],
+        "tags": [json.dumps(tag, ensure_ascii=False, sort_keys=True) for tag in tags]
+    }, geometry=gdf.geometry.to_numpy(), crs=gdf.crs)
+
+
+def features_from_place(place, tags, directory=None, allow_network=None, boundary_directory=None):
+    """
+    Drop-in for ox.features_from_place that answers from the local store.
+
+    Args:
+        place (str): Place name, e.g. "Bern, Switzerland"
+        tags (dict): e.g. {'place': ['suburb', 'neighbourhood']}
+        directory (str): Store folder, default $DAVIS_OSM_DIR or "karte/osm"
+        allow_network (bool): Fetch missing data with osmnx, default $DAVIS_OSM_NETWORK == "1"
+        boundary_directory (str): Folder of the swissBOUNDARIES3D files for place names (see boundaries.py)
+
+    Returns:
+        gpd.GeoDataFrame: Index (element, osmid), name, tag columns, geometry (WGS84), sorted by id
+    """
+    polygon = place_polygon(place, directory, allow_network, boundary_directory)
+    missing = [key for key in tags if not is_covered(key, polygon, directory)]
+    if missing:
+        if not network_allowed(allow_network):
+            raise FileNotFoundError(
+                f"No OSM data for {', '.join(missing)} around '{place}' in {osm_dir(directory)} "
+                f"(seed_from_extract or allow the network)")
+        import osmnx as ox
+        # alle Werte der Schlüssel holen, damit die Abdeckung auch für andere Werte gilt
+        fetched = ox.features_from_polygon(polygon, tags={key: True for key in missing})
+        # abgedeckt ist nur das Polygon selbst, nicht seine Box
+        seed_features(_from_osmnx(fetched), missing, coverage=polygon, directory=directory)
+    return features_from_polygon(polygon, tags, directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OSM-Speicher aus einem Extrakt füllen")
+    parser.add_argument('extract', help="z.B. switzerland-latest.osm.pbf")
+    parser.add_argument('--keys', nargs='+', default=list(DEFAULT_KEYS), help="Tag-Schlüssel, z.B. place boundary")
+    parser.add_argument('--dir', help=f"Speicherordner (sonst ${OSM_DIR_ENV} oder {DEFAULT_OSM_DIR})")
+    parser.add_argument('--bounds', type=float, nargs=4, metavar=('XMIN', 'YMIN', 'XMAX', 'YMAX'),
+                        help="Ausschnitt des Extrakts in WGS84 (sonst die Ausdehnung der Objekte)")
+    args = parser.parse_args()
+    seed_from_extract(args.extract, args.keys, args.dir, args.bounds)
+    for key in args.keys:
+        print(f"{key_path(key, args.dir)}: {len(gpd.read_parquet(key_path(key, args.dir)))} features")
+
+
+if __name__ == "__main__":
+    main()
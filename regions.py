@@ -0,0 +1,151 @@
+"""
+Verkehr pro Gemeinde / Bezirk.
+
+Jede Zählstelle wird einmal pro Datensatz und Ebene ihrer Gemeinde bzw. ihrem Bezirk zugeordnet:
+die Grenzen im Ausschnitt der Zählstellen kommen aus dem Grenzen-Speicher (boundaries.py),
+ein STRtree liefert pro Punkt nur die Polygone, deren Box ihn enthält, und nur diese werden exakt
+geprüft. Die Summen eines Zeitfensters pro Polygon sind danach eine Summe der Zählstellen-Summen
+des Würfels (rollup.py) über diese Zuordnung.
+"""
+
+import html
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+from boundaries import ROW_COLUMN, level_for_zoom, load_boundaries, load_simplified, web_geometries
+from datastore import derived
+from density import station_bounds
+from rollup import CHANNELS, COUNT_COLUMNS, traffic_cube
+
+REGION_LAYERS = ("gemeinden", "bezirke")
+NAME_COLUMN = "NAME"
+
+
+class StationRegions:
+    """
+    Station -> polygon assignment for one boundary layer.
+
+    Args:
+        easting (np.ndarray): LV95 easting per station (order of TrafficCube.stations)
+        northing (np.ndarray): LV95 northing per station
+        boundaries (gpd.GeoDataFrame): Polygons in LV95 with a NAME column
+
+    Attributes:
+        codes (np.ndarray): Row of `regions` per station, -1 outside all polygons
+        regions (pd.DataFrame): NAME of every polygon that contains at least one station
+        rows (np.ndarray): Row position in `boundaries` per region (NAME is not unique, e.g. exclaves)
+        polygons (np.ndarray): Stable store row id (_row, see boundaries.py) per region,
+            the row position if `boundaries` has no _row column
+        bounds (tuple): LV95 box of the stations, None without coordinates
+    """
+
+    def __init__(self, easting, northing, boundaries, name_column=NAME_COLUMN):
+        points = shapely.points(easting, northing)
+        tree = shapely.STRtree(boundaries.geometry.values)
+        # Punkte auf einer gemeinsamen Grenze treffen beide Polygone, das erste zählt
+        point_index, polygon_index = tree.query(points, predicate="intersects")
+        polygon_of = np.full(len(points), -1, dtype=np.int64)
+        polygon_of[point_index[::-1]] = polygon_index[::-1]
+
+        assigned = polygon_of >= 0
+        used, codes = np.unique(polygon_of[assigned], return_inverse=True)
+        self.codes = np.full(len(points), -1, dtype=np.int64)
+        self.codes[assigned] = codes
+        self.bounds = None
+        self.rows = used
+        self.polygons = boundaries[ROW_COLUMN].to_numpy()[used] if ROW_COLUMN in boundaries.columns else used
+        self.regions = pd.DataFrame({name_column: boundaries[name_column].to_numpy()[used]})
+        self.regions["stations"] = np.bincount(codes, minlength=len(used))
+
+    def aggregate(self, station_totals):
+        """
+        Sums a (stations x channels) array into (regions x channels), unassigned stations are skipped.
+        """
+        totals = np.zeros((len(self.regions), station_totals.shape[1]))
+        assigned = self.codes >= 0
+        np.add.at(totals, self.codes[assigned], station_totals[assigned])
+        return totals
+
+
+def _build_station_regions(counts_df, layer, directory):
+    stations = traffic_cube(counts_df).stations
+    easting = stations['OST'].to_numpy(dtype=float)
+    northing = stations['NORD'].to_numpy(dtype=float)
+    bounds = station_bounds(easting, northing, padding=0)
+    if bounds is None:
+        boundaries = gpd.GeoDataFrame({NAME_COLUMN: []}, geometry=[], crs="EPSG:2056")
+    else:
+        boundaries = load_boundaries(layer, bbox=bounds, columns=[NAME_COLUMN], directory=directory)
+    regions = StationRegions(easting, northing, boundaries)
+    regions.bounds = bounds
+    return regions
+
+
+def station_regions(counts_df, layer="gemeinden", directory=None):
+    """
+    StationRegions of a normalized counts table, built once per frame and layer.
+    """
+    return derived(counts_df, f"station_regions:{layer}",
+                   lambda df: _build_station_regions(df, layer, directory))
+
+
+def region_totals(counts_df, start_timestamp, end_timestamp, layer="gemeinden", directory=None):
+    """
+    Traffic per polygon for start <= DATUM_TS <= end.
+
+    Returns:
+        pd.DataFrame: One row per polygon with stations: NAME, stations, the count columns and 'rows'
+    """
+    regions = station_regions(counts_df, layer, directory)
+    totals = regions.aggregate(traffic_cube(counts_df).station_totals(start_timestamp, end_timestamp))
+    result = regions.regions.copy()
+    for i, col in enumerate(CHANNELS):
+        result[col] = totals[:, i]
+    return result
+
+
+def _color(norm):
+    # blau (wenig) bis rot (viel) wie das Dichte-Raster
+    return f"#{int(255 * norm):02x}00{int(255 * (1 - norm)):02x}"
+
+
+def _region_shapes(counts_df, zoom, layer, directory):
+    # vereinfachte WGS84-Polygone in der Reihenfolge von StationRegions.regions
+    regions = station_regions(counts_df, layer, directory)
+    if regions.regions.empty:
+        return None
+    # die vereinfachten Kopien haben dieselben _row-Nummern wie der Speicher
+    shapes = load_simplified(layer, zoom, rows=regions.polygons.tolist(), columns=[NAME_COLUMN],
+                             directory=directory)
+    return web_geometries(shapes).set_index(ROW_COLUMN).geometry.reindex(regions.polygons).to_numpy()
+
+
+def region_choropleth(counts_df, start_timestamp, end_timestamp, zoom, layer="gemeinden", directory=None):
+    """
+    GeoJSON FeatureCollection of the polygons with stations, colored by the total traffic of a window.
+
+    The polygons come from the simplified copy for the map zoom (in WGS84) and are prepared
+    once per counts frame, a new window only changes the colors and popups.
+    Features carry "color" and "popup" properties for livemap.
+
+    Returns:
+        dict: GeoJSON or None if no station lies inside a polygon
+    """
+    geometries = derived(counts_df, f"region_shapes:{layer}:{level_for_zoom(zoom)}",
+                         lambda df: _region_shapes(df, zoom, layer, directory))
+    if geometries is None:
+        return None
+    totals = region_totals(counts_df, start_timestamp, end_timestamp, layer, directory)
+    traffic = totals[COUNT_COLUMNS].sum(axis=1).to_numpy()
+    peak = traffic.max()
+    norm = traffic / peak if peak > 0 else np.zeros(len(traffic))
+    features = gpd.GeoDataFrame({
+        NAME_COLUMN: totals[NAME_COLUMN],
+        "color": [_color(value) for value in norm],
+        "popup": [f"{html.escape(str(name))}: {value:,.0f} ({count} Zählstellen)"
+                  for name, value, count in zip(totals[NAME_COLUMN], traffic, totals["stations"])]
+    }, geometry=geometries, crs="EPSG:4326")
+    return features[features.geometry.notna()].__geo_interface__
@@ -0,0 +1,186 @@
+"""
+Vorberechnete Stunden-Summen pro Zählstelle für die Zähldaten.
+
+Die Zählwerte werden einmal pro Datensatz in Stunden-Buckets summiert und entlang der Zeit
+kumuliert. Die Summe eines beliebigen Zeitfensters ist dann eine Differenz zweier
+Präfixsummen pro Zählstelle, ohne groupby über die Rohdaten.
+Pro Zählstelle werden nur die Stunden mit Daten gespeichert (dünn besetzt), der Speicher
+wächst mit der Anzahl (Zählstelle, Stunde)-Paare und nicht mit Zählstellen x Stunden.
+"""
+
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from datastore import derived
+from timeindex import time_index, window_end
+
+COUNT_COLUMNS = ['VELO_IN', 'VELO_OUT', 'FUSS_IN', 'FUSS_OUT']
+CHANNELS = COUNT_COLUMNS + ['rows']
+BUCKET_SECONDS = 3600
+
+
+def _row_values(rows):
+    # 4 Zählspalten + 1 für die Anzahl Zeilen
+    return np.column_stack(
+        [rows[col].fillna(0).to_numpy(dtype=float) for col in COUNT_COLUMNS] + [np.ones(len(rows))]
+    ) if len(rows) else np.zeros((0, len(CHANNELS)))
+
+
+class TrafficCube:
+    """
+    Cumulative station x hour totals of VELO_IN, VELO_OUT, FUSS_IN, FUSS_OUT and the row count.
+
+    Windows are inclusive on both ends like the original row filter
+    (start <= DATUM_TS <= end). Full hours come from the prefix sums, the rows of the
+    partial hours at the window edges are read from the time index of the counts frame.
+    The cube only keeps a weak reference to that frame.
+    """
+
+    def __init__(self, counts_df, time_column='DATUM_TS'):
+        index = time_index(counts_df, time_column)
+        rows = index.df
+        self.time_column = time_column
+        self._counts = weakref.ref(counts_df)
+
+        # Zählstellen einmal kodieren, Koordinaten der ersten Messung übernehmen
+        codes, stations = pd.factorize(rows['FK_STANDORT'], sort=True)
+        first = pd.DataFrame({'code': codes, 'OST': rows['OST'].to_numpy(), 'NORD': rows['NORD'].to_numpy()})
+        first = first.drop_duplicates('code').sort_values('code')
+        self.stations = pd.DataFrame({
+            'FK_STANDORT': np.asarray(stations),
+            'OST': first['OST'].to_numpy(),
+            'NORD': first['NORD'].to_numpy()
+        })
+
+        values = _row_values(rows)
+        n_stations = len(stations)
+        if len(rows):
+            buckets = index.values // BUCKET_SECONDS
+            self.first_bucket = int(buckets[0])
+            self.n_buckets = int(buckets[-1]) - self.first_bucket + 1
+            offsets = buckets - self.first_bucket
+        else:
+            self.first_bucket, self.n_buckets, offsets = 0, 0, np.zeros(0, dtype=np.int64)
+
+        # Summe über alle Zählstellen pro Stunde (dicht, nur Stunden x Kanäle), für Fenstersummen in O(1)
+        total = np.zeros((self.n_buckets + 1, len(CHANNELS)))
+        for channel in range(len(CHANNELS)):
+            total[1:, channel] = np.bincount(offsets, weights=values[:, channel], minlength=self.n_buckets)
+        self.cumulative_total = np.cumsum(total, axis=0, out=total)
+
+        # Pro Zählstelle nur Stunden mit Daten: Schlüssel Zählstelle * Stunden + Stunde, sortiert.
+        # cumulative[k] ist die Summe der Einträge vor k, innerhalb einer Zählstelle ist die
+        # Differenz zweier Positionen ihre Fenstersumme.
+        self.keys, entry = np.unique(codes.astype(np.int64) * max(self.n_buckets, 1) + offsets, return_inverse=True)
+        cumulative = np.zeros((len(self.keys) + 1, len(CHANNELS)))
+        for channel in range(len(CHANNELS)):
+            cumulative[1:, channel] = np.bincount(entry, weights=values[:, channel], minlength=len(self.keys))
+        self.cumulative = np.cumsum(cumulative, axis=0, out=cumulative)
+        self._station_offsets = np.arange(n_stations, dtype=np.int64) * max(self.n_buckets, 1)
+
+    def _offset(self, bucket):
+        return min(max(bucket - self.first_bucket, 0), self.n_buckets)
+
+    def _prefix(self, bucket, per_station):
+        # Summe aller Buckets < bucket, gesamt oder pro Zählstelle
+        if not per_station:
+            return self.cumulative_total[self._offset(bucket)]
+        return self.cumulative[np.searchsorted(self.keys, self._station_offsets + self._offset(bucket))]
+
+    def _rows(self, start, end, per_station):
+        # Rohzeilen mit start <= ts <= end, direkt aus dem sortierten Frame
+        counts_df = self._counts()
+        if counts_df is None:
+            raise RuntimeError("The counts frame of this TrafficCube no longer exists")
+        rows = time_index(counts_df, self.time_column).between(start, end)
+        values = _row_values(rows)
+        if not per_station:
+            return values.sum(axis=0)
+        totals = np.zeros((len(self.stations), len(CHANNELS)))
+        if len(rows):
+            codes = np.searchsorted(self.stations['FK_STANDORT'].to_numpy(), rows['FK_STANDORT'].to_numpy())
+            np.add.at(totals, codes, values)
+        return totals
+
+    def _window_totals(self, start_timestamp, end_timestamp, per_station):
+        first_full = -(-start_timestamp // BUCKET_SECONDS)
+        end_full = (end_timestamp + 1) // BUCKET_SECONDS
+        if end_full <= first_full:
+            return self._rows(start_timestamp, end_timestamp, per_station)
+        totals = self._prefix(end_full, per_station) - self._prefix(first_full, per_station)
+        if start_timestamp < first_full * BUCKET_SECONDS:
+            totals = totals + self._rows(start_timestamp, first_full * BUCKET_SECONDS - 1, per_station)
+        if end_full * BUCKET_SECONDS <= end_timestamp:
+            totals = totals + self._rows(end_full * BUCKET_SECONDS, end_timestamp, per_station)
+        return totals
+
+    def station_totals(self, start_timestamp, end_timestamp):
+        """
+        Totals per station for start <= DATUM_TS <= end as (stations x channels) array.
+        """
+        return self._window_totals(start_timestamp, end_timestamp, per_station=True)
+
+    def totals(self, start_timestamp, end_timestamp):
+        """
+        Totals over all stations for start <= DATUM_TS <= end.
+
+        Returns:
+            pd.Series: Sums of the count columns and the number of rows ('rows')
+        """
+        return pd.Series(self._window_totals(start_timestamp, end_timestamp, per_station=False), index=CHANNELS)
+
+    def between(self, start_timestamp, end_timestamp):
+        """
+        Same result as groupby('FK_STANDORT') over the rows in the window:
+        one row per station with data, with the summed count columns and OST/NORD.
+        """
+        totals = self.station_totals(start_timestamp, end_timestamp)
+        present = totals[:, -1] > 0
+        traffic = self.stations[present].reset_index(drop=True)
+        for i, col in enumerate(COUNT_COLUMNS):
+            traffic[col] = totals[present, i]
+        return traffic[['FK_STANDORT'] + COUNT_COLUMNS + ['OST', 'NORD']]
+
+    def window(self, start_timestamp, duration, unit):
+        return self.between(start_timestamp, window_end(start_timestamp, duration, unit))
+
+
+def traffic_cube(counts_df):
+    """
+    TrafficCube for a normalized counts table, built once per DataFrame.
+    """
+    return derived(counts_df, 'traffic_cube', TrafficCube)
+
+
+def _build_baselines(counts_df):
+    cube = traffic_cube(counts_df)
+    hourly = np.diff(cube.cumulative_total, axis=0)
+    buckets = cube.first_bucket + np.arange(len(hourly))
+
+    # Stunde des Tages und Tag wie bei DATUM (DATUM_TS ist DATUM als UTC gelesen)
+    hour_of_day = np.zeros((24, len(CHANNELS)))
+    np.add.at(hour_of_day, buckets % 24, hourly)
+    days = buckets // 24
+    daily = np.zeros((int(days.max() - days.min() + 1) if len(days) else 0, len(CHANNELS)))
+    if len(days):
+        np.add.at(daily, days - days.min(), hourly)
+    daily = daily[daily[:, -1] > 0]
+
+    return {
+        'total': pd.Series(cube.cumulative_total[-1], index=CHANNELS),
+        'hour_of_day': pd.DataFrame(hour_of_day, columns=CHANNELS),
+        'daily_mean': pd.Series(daily.mean(axis=0) if len(daily) else np.zeros(len(CHANNELS)), index=CHANNELS),
+    }
+
+
+def traffic_baselines(counts_df):
+    """
+    Full-dataset baselines for the Key Statistics panel, computed once per counts frame.
+
+    Returns:
+        dict: 'total' (sums over all rows), 'hour_of_day' (24 rows of sums per hour of day)
+              and 'daily_mean' (mean of the daily sums over all days with data)
+    """
+    return derived(counts_df, 'traffic_baselines', _build_baselines)
@@ -3,6 +3,7 @@ g_chat = "https://grok.com/chat/67fafe81-f981-406c-8d98-7977133c1b0c"
 link1 = "data.stadt-zuerich.ch"
 link2 = "opentransportdata.swiss"
 
+import argparse
 import seaborn as sns
 import matplotlib.pyplot as plt
 import pandas as pd
@@ -10,50 +11,81 @@ import plotly.express as px
 import numpy as np
 from datetime import datetime, timezone
 
-# 1. Daten einlesen
-# Wetterdaten
-wetter_df = pd.read_csv('wetter/zurich_23.csv')
-# mobilität Zürich
-mobility_df = pd.read_csv('mobility_zurich/zurich_mobility.csv')
-
-# 2. Zeitstempel vorbereiten
-# Wetterdaten: dt_iso in datetime umwandeln und auf Stunde runden
-wetter_df['dt_iso'] = pd.to_datetime(wetter_df['dt_iso'].str.replace(' +0000 UTC', '', regex=False), format='%Y-%m-%d %H:%M:%S')
-wetter_df['date_hour'] = wetter_df['dt_iso'].dt.floor('H')
-
-# Mobilitätsdaten: DATUM in datetime umwandeln
-mobility_df['DATUM'] = pd.to_datetime(mobility_df['DATUM'], format='%Y-%m-%dT%H:%M')
-mobility_df['date_hour'] = mobility_df['DATUM'].dt.floor('H')
-
-# 3. Daten kombinieren (Merge auf date_hour)
-combined_df = pd.merge(
-    mobility_df,
-    wetter_df,
-    how='left',
-    on='date_hour',
-    suffixes=('_mobility', '_weather')
-)
-
-# Entferne Hilfsspalte
-combined_df = combined_df.drop(columns=['date_hour'])
-
-# 4. Deskriptive Statistik
+from datastore import normalize_counts
+from streamstats import RunningStats, stream_joined_counts
+from weatherjoin import joined_weather
+
+parser = argparse.ArgumentParser(description="Deskriptive Statistik Wetter und Mobilität Zürich")
+parser.add_argument('--stream', action='store_true',
+                    help="Zähldaten blockweise lesen und laufende Statistik führen (beschränkter Speicher)")
+parser.add_argument('--chunksize', type=int, default=500_000, help="Zeilen pro Block im Streaming-Modus")
+args = parser.parse_args()
+
+mobility_path = 'mobility_zurich/zurich_mobility.csv'
+
 # Numerische Variablen
 numerical_cols = [
     'temp', 'visibility', 'dew_point', 'feels_like', 'temp_min', 'temp_max',
     'pressure', 'humidity', 'wind_speed', 'wind_gust', 'clouds_all',
     'VELO_IN', 'VELO_OUT', 'FUSS_IN', 'FUSS_OUT'
 ]
-numerical_stats = combined_df[numerical_cols].describe()
-
 # Kategoriale Variablen
 categorical_cols = ['weather_main', 'weather_description', 'FK_STANDORT']
-categorical_stats = {}
-for col in categorical_cols:
-    categorical_stats[col] = combined_df[col].value_counts()
 
-# Korrelationsmatrix für numerische Variablen
-correlation_matrix = combined_df[numerical_cols].corr()
+# 1. Daten einlesen
+# Wetterdaten
+wetter_df = pd.read_csv('wetter/zurich_23.csv')
+
+if args.stream:
+    # 2.-4. Blockweise: jeder Block wird mit dem Wetter verknüpft und in die laufende Statistik übernommen
+    running = RunningStats(numerical_cols)
+    categorical_stats = {col: pd.Series(dtype='int64') for col in categorical_cols}
+    daily_parts = []
+    for chunk in stream_joined_counts(mobility_path, wetter_df, chunksize=args.chunksize):
+        running.update(chunk)
+        for col in categorical_cols:
+            categorical_stats[col] = categorical_stats[col].add(chunk[col].value_counts(), fill_value=0)
+        daily_parts.append(chunk.groupby(chunk['DATUM_TS'] // 86400)[['temp', 'VELO_IN']].agg(['sum', 'count']))
+
+    numerical_stats = running.describe()
+    categorical_stats = {col: counts.astype('int64').sort_values(ascending=False).rename('count')
+                         for col, counts in categorical_stats.items()}
+    correlation_matrix = running.corr()
+
+    # Tagesmittel aus den Summen und Anzahlen der Blöcke
+    daily = pd.concat(daily_parts).groupby(level=0).sum()
+    daily_df = pd.DataFrame({
+        'DATUM': pd.to_datetime(daily.index * 86400, unit='s').date,
+        'temp': (daily[('temp', 'sum')] / daily[('temp', 'count')]).to_numpy(),
+        'VELO_IN': (daily[('VELO_IN', 'sum')] / daily[('VELO_IN', 'count')]).to_numpy()
+    })
+else:
+    # mobilität Zürich
+    mobility_df = pd.read_csv(mobility_path)
+
+    # 2. Zeitstempel vorbereiten
+    # Mobilitätsdaten: DATUM in datetime umwandeln, dazu die Epoch-Sekunden (DATUM_TS)
+    mobility_df['DATUM'] = pd.to_datetime(mobility_df['DATUM'], format='%Y-%m-%dT%H:%M')
+    mobility_df = normalize_counts(mobility_df)
+
+    # 3. Daten kombinieren: Stunden-Buckets aus 'dt' und 'DATUM_TS' (weatherjoin.py)
+    combined_df = joined_weather(mobility_df, wetter_df)
+
+    # 4. Deskriptive Statistik
+    numerical_stats = combined_df[numerical_cols].describe()
+
+    categorical_stats = {}
+    for col in categorical_cols:
+        categorical_stats[col] = combined_df[col].value_counts()
+
+    # Korrelationsmatrix für numerische Variablen
+    correlation_matrix = combined_df[numerical_cols].corr()
+
+    # Tägliche Mittelwerte für den Zeitreihenplot
+    daily_df = combined_df.groupby(combined_df['DATUM'].dt.date).agg({
+        'temp': 'mean',
+        'VELO_IN': 'mean'
+    }).reset_index()
 
 # 5. Ergebnisse ausgeben
 print("=== Deskriptive Statistik: Numerische Variablen ===")
@@ -69,13 +101,7 @@ print(correlation_matrix)
 
 # 7. Zeitreihenplot
 
-# 1. Daten auf tägliche Mittelwerte aggregieren
-daily_df = combined_df.groupby(combined_df['DATUM'].dt.date).agg({
-    'temp': 'mean',
-    'VELO_IN': 'mean'
-}).reset_index()
-
-# 2. Schneller Plot mit Plotly
+# Schneller Plot mit Plotly
 fig = px.line(daily_df, x='DATUM', y=['temp', 'VELO_IN'], title='Temperatur und Fahrradfahrten 2023')
 fig.update_layout(xaxis_title='Datum', yaxis_title='Werte')
 fig.show()
@@ -0,0 +1,188 @@
+"""
+Laufende Statistik über Datenblöcke (Streaming) mit beschränktem Speicher.
+
+Pro Block werden Mittelwerte, Ko-Momente, Min/Max und eine Quantil-Skizze berechnet und mit
+den bisherigen Werten zusammengeführt (paarweise Formel von Chan et al.). Das Ergebnis entspricht
+describe() / cov() / corr() über die ganze Tabelle, die Quantile sind Näherungen mit
+beschränktem relativem Fehler.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from datastore import normalize_counts
+from weatherjoin import join_weather
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with logarithmic buckets (DDSketch).
+
+    Every quantile is returned with a relative error of at most relative_accuracy,
+    memory grows with the log of the value range, not with the number of values.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zeros = 0
+        self.count = 0
+
+    def _add_keys(self, store, values):
+        keys, counts = np.unique(np.ceil(np.log(values) / self._log_gamma).astype(np.int64), return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            store[key] = store.get(key, 0) + count
+
+    def add(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            return self
+        self._add_keys(self.positive, values[values > 0])
+        self._add_keys(self.negative, -values[values < 0])
+        self.zeros += int((values == 0).sum())
+        self.count += len(values)
+        return self
+
+    def merge(self, other):
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in other_store.items():
+                store[key] = store.get(key, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+        return self
+
+    def _value(self, key):
+        # Mitte des Buckets (gamma^(k-1), gamma^k] mit beschränktem relativem Fehler
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def quantile(self, q):
+        if self.count == 0:
+            return np.nan
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._value(key)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._value(key)
+        return self._value(max(self.positive))
+
+
+class RunningStats:
+    """
+    Count, mean, variance, min/max, approximate quantiles and the covariance matrix of
+    numeric columns, updated block by block.
+
+    Missing values are skipped per column (count, mean, ...) and per column pair
+    (covariance, correlation), like pandas describe() and corr().
+    """
+
+    def __init__(self, columns, quantiles=(0.25, 0.5, 0.75), relative_accuracy=0.01):
+        self.columns = list(columns)
+        self.quantiles = tuple(quantiles)
+        k = len(self.columns)
+        # paarweise: Anzahl, Mittelwert von i über die Zeilen mit i und j, Ko-Moment
+        self.n = np.zeros((k, k))
+        self.mean = np.zeros((k, k))
+        self.comoment = np.zeros((k, k))
+        # Quadratsumme der Abweichungen von i über die Zeilen mit i und j (für corr)
+        self.squares = np.zeros((k, k))
+        self.minimum = np.full(k, np.inf)
+        self.maximum = np.full(k, -np.inf)
+        self.sketches = [QuantileSketch(relative_accuracy) for _ in self.columns]
+
+    def update(self, df):
+        """
+        Adds the rows of a block (DataFrame with all columns).
+        """
+        values = df[self.columns].to_numpy(dtype=float)
+        if len(values) == 0:
+            return self
+        valid = np.isfinite(values)
+        mask = valid.astype(float)
+
+        # Block zuerst um seine Spaltenmittel zentrieren (numerisch stabil)
+        counts = valid.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            center = np.where(counts > 0, np.where(valid, values, 0).sum(axis=0) / counts, 0)
+        centered = np.where(valid, values - center, 0)
+
+        n_b = mask.T @ mask
+        sums = centered.T @ mask
+        with np.errstate(invalid='ignore', divide='ignore'):
+            shift = np.where(n_b > 0, sums / n_b, 0)
+        mean_b = center[:, None] + shift
+        comoment_b = centered.T @ centered - shift * sums.T
+        squares_b = (centered ** 2).T @ mask - shift * sums
+
+        # Zusammenführen (Chan et al.): C = C_a + C_b + d_i * d_j * n_a * n_b / n
+        n = self.n + n_b
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight = np.where(n > 0, self.n * n_b / n, 0)
+            delta = mean_b - self.mean
+            self.comoment += comoment_b + delta * delta.T * weight
+            self.squares += squares_b + delta ** 2 * weight
+            self.mean += np.where(n > 0, delta * n_b / n, 0)
+        self.n = n
+
+        self.minimum = np.fmin(self.minimum, np.nanmin(np.where(valid, values, np.inf), axis=0))
+        self.maximum = np.fmax(self.maximum, np.nanmax(np.where(valid, values, -np.inf), axis=0))
+        for sketch, column in zip(self.sketches, values.T):
+            sketch.add(column)
+        return self
+
+    def describe(self):
+        """
+        Table like DataFrame.describe() (quantiles approximate).
+        """
+        count = np.diag(self.n)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std = np.sqrt(np.where(count > 1, np.diag(self.comoment) / (count - 1), np.nan))
+        rows = {
+            'count': count,
+            'mean': np.where(count > 0, np.diag(self.mean), np.nan),
+            'std': std,
+            'min': np.where(count > 0, self.minimum, np.nan)
+        }
+        for q in self.quantiles:
+            # Näherung nie ausserhalb des exakten Bereichs
+            rows[f"{q * 100:g}%"] = np.clip([sketch.quantile(q) for sketch in self.sketches],
+                                            self.minimum, self.maximum)
+        rows['max'] = np.where(count > 0, self.maximum, np.nan)
+        return pd.DataFrame(rows, index=self.columns).T
+
+    def cov(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = np.where(self.n > 1, self.comoment / (self.n - 1), np.nan)
+        return pd.DataFrame(cov, index=self.columns, columns=self.columns)
+
+    def corr(self):
+        """
+        Pairwise Pearson correlation like DataFrame.corr().
+        """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = self.comoment / np.sqrt(self.squares * self.squares.T)
+        corr = np.where(self.n > 1, np.clip(corr, -1, 1), np.nan)
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+
+def stream_joined_counts(counts_path, weather_df, chunksize=500_000, columns=None, usecols=None):
+    """
+    Reads a counts CSV in blocks and yields every block joined with the weather of its hour.
+
+    Only one block plus the weather table is in memory at a time, the hour lookup of the
+    weather is built once (see weatherjoin).
+    """
+    for chunk in pd.read_csv(counts_path, chunksize=chunksize, usecols=usecols):
+        yield join_weather(normalize_counts(chunk), weather_df, columns)
@@ -0,0 +1,90 @@
+"""
+Zeitfenster über sortierten Epoch-Spalten ('dt' im Wetter, 'DATUM_TS' in den Zähldaten).
+
+Ein Fenster wird per Binärsuche in einen Positions-Slice übersetzt, statt jedes Mal
+eine boolesche Maske über die ganze Tabelle zu bauen.
+"""
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from datastore import derived
+
+UNIT_SECONDS = {"Hours": 3600, "Days": 86400}
+
+
+def window_end(start_timestamp, duration, unit):
+    """
+    End timestamp of a (start, duration, unit) window as used by the dashboard controls.
+
+    Args:
+        start_timestamp (int): Start in epoch seconds
+        duration (int): Number of units
+        unit (str): "Hours", "Days" or "Months"
+
+    Returns:
+        int: End in epoch seconds (the window includes it)
+    """
+    if unit in UNIT_SECONDS:
+        return start_timestamp + duration * UNIT_SECONDS[unit]
+    # Months: bis zum Monatsanfang nach 'duration' Monaten
+    start_date = datetime.fromtimestamp(start_timestamp)
+    return int((start_date + pd.offsets.MonthBegin(duration)).timestamp())
+
+
+class TimeRangeIndex:
+    """
+    Sorted epoch column of a DataFrame with O(log N) range lookups.
+
+    If the column is not sorted yet, the frame is sorted once (stable) when the index is built.
+    Lookups return positional slices of that frame, i.e. views and no copies.
+    """
+
+    def __init__(self, df, column, values=None):
+        if values is not None:
+            # bereits geprüft (siehe time_index)
+            self.df, self.column, self.values = df, column, values
+            return
+        values = df[column].to_numpy()
+        if len(values) > 1 and not np.all(values[1:] >= values[:-1]):
+            df = df.sort_values(column, kind="stable")
+            values = df[column].to_numpy()
+        self.df = df
+        self.column = column
+        self.values = values
+
+    def __len__(self):
+        return len(self.values)
+
+    def positions(self, start, end):
+        """
+        Positional slice of all rows with start <= value <= end.
+        """
+        lo = int(np.searchsorted(self.values, start, side="left"))
+        hi = int(np.searchsorted(self.values, end, side="right"))
+        return slice(lo, max(lo, hi))
+
+    def between(self, start, end):
+        return self.df.iloc[self.positions(start, end)]
+
+    def window(self, start_timestamp, duration, unit):
+        return self.between(start_timestamp, window_end(start_timestamp, duration, unit))
+
+
+def _build_index_entry(df, column):
+    index = TimeRangeIndex(df, column)
+    # Keine Referenz auf df selbst speichern, sonst wird der Eintrag nie freigegeben
+    return index.values, (index.df if index.df is not df else None)
+
+
+def time_index(df, column):
+    """
+    Returns the TimeRangeIndex for df[column], building it on first use.
+
+    The index lives as long as the DataFrame, so frames shared through the data store
+    are indexed once per process.
+    """
+    values, sorted_df = derived(df, f"time_index:{column}", lambda frame: _build_index_entry(frame, column))
+    return TimeRangeIndex(df if sorted_df is None else sorted_df, column, values=values)
@@ -0,0 +1,66 @@
+"""
+Zusammenfassung der stündlichen Wetterdaten pro Tag.
+
+Mittelwerte kommen aus groupby, der häufigste Wert der kategorialen Spalten (Icon, Beschreibung)
+wird über Integer-Codes mit bincount/argmax bestimmt statt mit Series.mode pro Gruppe.
+"""
+
+import numpy as np
+import pandas as pd
+
+MEAN_COLUMNS = ['temp', 'humidity', 'wind_speed']
+MODE_COLUMNS = ['weather_icon', 'weather_description']
+
+
+def group_mode(groups, n_groups, values):
+    """
+    Most frequent value per group, like x.mode().iloc[0] (ties -> smallest value).
+
+    Args:
+        groups (np.ndarray): Group number 0..n_groups-1 per row
+        n_groups (int): Number of groups
+        values (pd.Series): Categorical values per row
+
+    Returns:
+        np.ndarray: Mode per group; groups without any value get their first row's value
+    """
+    codes, categories = pd.factorize(values, sort=True)
+    valid = codes >= 0
+    counts = np.bincount(groups[valid] * len(categories) + codes[valid],
+                         minlength=n_groups * len(categories)).reshape(n_groups, len(categories))
+    result = np.asarray(categories, dtype=object)[counts.argmax(axis=1)] if len(categories) else \
+        np.empty(n_groups, dtype=object)
+
+    # wie bisher: ohne Modus (nur NaN) den ersten Wert der Gruppe nehmen
+    empty = counts.sum(axis=1) == 0 if len(categories) else np.ones(n_groups, dtype=bool)
+    if empty.any():
+        first_rows = np.unique(groups, return_index=True)[1]
+        result[empty] = values.to_numpy()[first_rows][empty]
+    return result
+
+
+def daily_weather_summary(df):
+    """
+    One row per (UTC) day with mean temp/humidity/wind, the most frequent icon and
+    description and the first 'dt' of the day. The input is not modified.
+
+    Args:
+        df (pd.DataFrame): Hourly weather rows with 'dt' in epoch seconds
+
+    Returns:
+        pd.DataFrame: Columns date, temp, humidity, wind_speed, weather_icon, weather_description, dt
+    """
+    days = df['dt'].to_numpy() // 86400
+    groups, unique_days = pd.factorize(days, sort=True)
+    n_groups = len(unique_days)
+
+    columns = [col for col in MEAN_COLUMNS if col in df.columns]
+    summary = df[columns + ['dt']].groupby(groups).agg({**{col: 'mean' for col in columns}, 'dt': 'first'})
+    summary = summary.reset_index(drop=True)
+    for col in MODE_COLUMNS:
+        if col in df.columns:
+            summary[col] = group_mode(groups, n_groups, df[col])
+
+    summary.insert(0, 'date', pd.to_datetime(unique_days * 86400, unit='s').date)
+    ordered = ['date'] + columns + [col for col in MODE_COLUMNS if col in df.columns] + ['dt']
+    return summary[ordered]
@@ -0,0 +1,193 @@
+"""
+Bereinigung der stündlichen Wetter-Exporte (z.B. wetter/bern_23.csv -> bern_23_clean.csv).
+
+Duplikate, Lücken und Zeitstempel ausser der Reihe werden mit Array-Operationen auf 'dt'
+erkannt. Die Datei wird blockweise gelesen, gemerkt wird nur ein Bit pro Stunde.
+Behalten wird die erste Zeile jeder vollen Stunde, die bereinigte Datei ist nach 'dt' sortiert.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+HOUR_SECONDS = 3600
+
+
+class HourSet:
+    """
+    Bitmap of the hour buckets seen so far, grows in both directions as needed.
+    """
+
+    def __init__(self):
+        self.first = None
+        self.seen = np.zeros(0, dtype=bool)
+
+    def _cover(self, lo, hi):
+        if self.first is None:
+            self.first = lo
+            self.seen = np.zeros(hi - lo + 1, dtype=bool)
+            return
+        last = self.first + len(self.seen) - 1
+        if lo < self.first or hi > last:
+            new_first, new_last = min(lo, self.first), max(hi, last)
+            seen = np.zeros(new_last - new_first + 1, dtype=bool)
+            seen[self.first - new_first:self.first - new_first + len(self.seen)] = self.seen
+            self.first, self.seen = new_first, seen
+
+    def add_first(self, buckets):
+        """
+        Marks the buckets as seen and returns a mask of the entries seen for the first time
+        (earlier blocks and earlier entries of the same block count).
+        """
+        buckets = np.asarray(buckets, dtype=np.int64)
+        first = np.zeros(len(buckets), dtype=bool)
+        if len(buckets) == 0:
+            return first
+        self._cover(int(buckets.min()), int(buckets.max()))
+        _, first_index = np.unique(buckets, return_index=True)
+        first[first_index] = True
+        first &= ~self.seen[buckets - self.first]
+        self.seen[buckets[first] - self.first] = True
+        return first
+
+    def missing_runs(self):
+        """
+        Runs of missing hours between the first and the last seen hour as (first, last) buckets.
+        """
+        if self.first is None:
+            return []
+        missing = np.flatnonzero(~self.seen)
+        if len(missing) == 0:
+            return []
+        breaks = np.flatnonzero(np.diff(missing) > 1)
+        starts = missing[np.r_[0, breaks + 1]]
+        ends = missing[np.r_[breaks, len(missing) - 1]]
+        return [(int(start) + self.first, int(end) + self.first) for start, end in zip(starts, ends)]
+
+
+def _runs(values):
+    # aufeinanderfolgende Stunden zu [erste, letzte, Anzahl] zusammenfassen
+    if len(values) == 0:
+        return []
+    hours, counts = np.unique(np.asarray(values, dtype=np.int64) // HOUR_SECONDS, return_counts=True)
+    breaks = np.flatnonzero(np.diff(hours) > 1)
+    starts = np.r_[0, breaks + 1]
+    ends = np.r_[breaks, len(hours) - 1]
+    return [[int(hours[s]) * HOUR_SECONDS, int(hours[e]) * HOUR_SECONDS, int(counts[s:e + 1].sum())]
+            for s, e in zip(starts, ends)]
+
+
+def _merge_late(out_path, late, time_column, chunksize):
+    """
+    Sorts rows that arrived after later hours were already written into the cleaned file.
+    """
+    late = late.sort_values(time_column, kind='stable')
+    late_dt = late[time_column].to_numpy()
+    tmp_path = f"{out_path}.tmp"
+    header = True
+    taken = 0
+    for chunk in pd.read_csv(out_path, chunksize=chunksize or 1_000_000):
+        upto = int(np.searchsorted(late_dt, chunk[time_column].max(), side='right'))
+        if upto > taken:
+            chunk = pd.concat([chunk, late.iloc[taken:upto]]).sort_values(time_column, kind='stable')
+            taken = upto
+        chunk.to_csv(tmp_path, mode='w' if header else 'a', header=header, index=False)
+        header = False
+    if taken < len(late):
+        late.iloc[taken:].to_csv(tmp_path, mode='w' if header else 'a', header=header, index=False)
+    os.replace(tmp_path, out_path)
+
+
+def clean_weather(path, out_path, report_path=None, chunksize=None, time_column='dt'):
+    """
+    Writes a copy of an hourly weather export without duplicates, sorted by time, and a report.
+
+    Args:
+        path (str): Raw export, e.g. wetter/bern_23.csv
+        out_path (str): Cleaned file, e.g. wetter/bern_23_clean.csv
+        report_path (str): Optional JSON file for the report
+        chunksize (int): Rows per block for very large exports, None reads the file at once
+        time_column (str): Epoch column
+
+    Returns:
+        dict: Report with row counts, duplicate runs, gaps, out-of-order and off-grid rows
+    """
+    hours = HourSet()
+    rows = kept = out_of_order = off_grid = 0
+    duplicate_dt = []
+    late = []
+    written_max = None
+    running_max = None
+    header = True
+    chunks = pd.read_csv(path, chunksize=chunksize) if chunksize else [pd.read_csv(path)]
+    for chunk in chunks:
+        dt = chunk[time_column].to_numpy(dtype=np.int64)
+        if len(dt) == 0:
+            continue
+        rows += len(dt)
+
+        # ausser der Reihe: kleiner als das Maximum aller vorherigen Zeilen
+        previous_max = np.maximum.accumulate(np.r_[running_max if running_max is not None else dt[0], dt])[:-1]
+        out_of_order += int((dt < previous_max).sum())
+        running_max = int(max(previous_max[-1], dt[-1]))
+
+        on_grid = dt % HOUR_SECONDS == 0
+        off_grid += int((~on_grid).sum())
+        keep = np.zeros(len(dt), dtype=bool)
+        keep[on_grid] = hours.add_first(dt[on_grid] // HOUR_SECONDS)
+        duplicate_dt.append(dt[on_grid & ~keep])
+
+        result = chunk[keep]
+        if written_max is not None:
+            is_late = result[time_column].to_numpy() < written_max
+            if is_late.any():
+                late.append(result[is_late])
+                result = result[~is_late]
+        result = result.sort_values(time_column, kind='stable')
+        if len(result):
+            written_max = int(result[time_column].iloc[-1])
+        kept += int(keep.sum())
+        result.to_csv(out_path, mode='w' if header else 'a', header=header, index=False)
+        header = False
+
+    if late:
+        _merge_late(out_path, pd.concat(late), time_column, chunksize)
+
+    gaps = [[first * HOUR_SECONDS, last * HOUR_SECONDS, last - first + 1] for first, last in hours.missing_runs()]
+    duplicates = np.concatenate(duplicate_dt) if duplicate_dt else np.zeros(0, dtype=np.int64)
+    report = {
+        "source": path,
+        "rows": rows,
+        "kept": kept,
+        "first_dt": hours.first * HOUR_SECONDS if hours.first is not None else None,
+        "last_dt": (hours.first + len(hours.seen) - 1) * HOUR_SECONDS if hours.first is not None else None,
+        "duplicates": int(len(duplicates)),
+        "duplicate_runs": _runs(duplicates),
+        "out_of_order": out_of_order,
+        "off_grid": off_grid,
+        "missing_hours": int(sum(gap[2] for gap in gaps)),
+        "gaps": gaps
+    }
+    if report_path:
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+def format_report(report):
+    """
+    Short text version of a clean_weather report, one line per gap / duplicate run.
+    """
+    def iso(ts):
+        return pd.to_datetime(ts, unit='s').strftime('%Y-%m-%d %H:%M')
+
+    lines = [
+        f"{report['source']}: {report['rows']} rows, {report['kept']} kept",
+        f"  duplicates: {report['duplicates']}, out of order: {report['out_of_order']}, "
+        f"off grid: {report['off_grid']}, missing hours: {report['missing_hours']}"
+    ]
+    lines += [f"  duplicate {iso(first)} - {iso(last)}: {count} rows" for first, last, count in report['duplicate_runs']]
+    lines += [f"  gap {iso(first)} - {iso(last)}: {hours} h" for first, last, hours in report['gaps']]
+    return "\n".join(lines)
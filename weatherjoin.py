@@ -0,0 +1,171 @@
+"""
+Verknüpfung der Zähldaten mit dem Wetter derselben Stunde.
+
+Beide Seiten werden auf int64-Stunden-Buckets abgebildet ('dt' // 3600 im Wetter,
+'DATUM_TS' // 3600 in den Zähldaten). Pro Wettertabelle wird einmal ein Array
+Bucket -> Zeilenposition gebaut, danach ist der Join ein direkter Positionszugriff
+ohne Parsen von Datums-Strings und ohne pd.merge.
+"""
+
+import numpy as np
+import pandas as pd
+
+from datastore import derived, normalize_counts
+
+BUCKET_SECONDS = 3600
+
+
+class WeatherLookup:
+    """
+    Hour bucket -> row position of a weather table.
+
+    If an hour occurs more than once, the first row is used.
+    """
+
+    def __init__(self, weather_df, time_column='dt'):
+        buckets = weather_df[time_column].to_numpy(dtype='int64') // BUCKET_SECONDS
+        if len(buckets):
+            self.first_bucket = int(buckets.min())
+            self.positions = np.full(int(buckets.max()) - self.first_bucket + 1, -1, dtype=np.int64)
+            # rückwärts schreiben, damit die erste Zeile pro Stunde gewinnt
+            order = np.arange(len(buckets) - 1, -1, -1)
+            self.positions[buckets[order] - self.first_bucket] = order
+        else:
+            self.first_bucket = 0
+            self.positions = np.zeros(0, dtype=np.int64)
+
+    def lookup(self, timestamps):
+        """
+        Weather row positions for epoch timestamps, -1 where the hour is missing.
+        """
+        offsets = np.asarray(timestamps, dtype='int64') // BUCKET_SECONDS - self.first_bucket
+        inside = (offsets >= 0) & (offsets < len(self.positions))
+        result = np.full(len(offsets), -1, dtype=np.int64)
+        result[inside] = self.positions[offsets[inside]]
+        return result
+
+
+def weather_lookup(weather_df, time_column='dt'):
+    """
+    Cached WeatherLookup of a weather frame (built once per frame).
+    """
+    return derived(weather_df, f"weather_lookup:{time_column}", lambda df: WeatherLookup(df, time_column))
+
+
+def take_weather_columns(weather_df, positions, columns):
+    """
+    Weather columns at the given row positions, NaN where the position is -1.
+    """
+    # .array.take behält den Spaltentyp (z.B. string), int wird mit Lücken zu float
+    return pd.DataFrame({col: weather_df[col].array.take(positions, allow_fill=True) for col in columns})
+
+
+def join_weather(counts_df, weather_df, columns=None, time_column='DATUM_TS'):
+    """
+    Attaches the weather of the same hour to every count row.
+
+    Same rows as a left merge on the hour (as long as every hour occurs once in the weather),
+    but through a positional lookup.
+
+    Args:
+        counts_df (pd.DataFrame): Counts, 'DATUM_TS' is added with normalize_counts if missing
+        weather_df (pd.DataFrame): Weather with the epoch column 'dt'
+        columns (list): Weather columns to attach, default: all except those already in counts_df
+        time_column (str): Epoch column of the counts
+
+    Returns:
+        pd.DataFrame: counts_df with the weather columns, same index
+    """
+    if time_column not in counts_df.columns:
+        counts_df = normalize_counts(counts_df)
+    if columns is None:
+        columns = [col for col in weather_df.columns if col not in counts_df.columns]
+    positions = weather_lookup(weather_df).lookup(counts_df[time_column].to_numpy())
+    weather = take_weather_columns(weather_df, positions, columns)
+    weather.index = counts_df.index
+    return pd.concat([counts_df, weather], axis=1)
+
+
+class WeatherJoin:
+    """
+    Combined counts + weather frame that is built once and then updated incrementally.
+
+    New count rows are joined on their own (append_counts). New weather rows only fill the
+    hours that were missing so far (update_weather), already joined rows are not looked up again.
+    Updates never modify a frame that was already returned by `frame`, they replace the parts.
+    """
+
+    def __init__(self, counts_df, weather_df, columns=None):
+        self.columns = columns
+        self._weather = weather_df
+        self._parts = []
+        self._frame = None
+        self.append_counts(counts_df)
+
+    def append_counts(self, counts_df):
+        """
+        Joins only the new count rows and adds them as a new part.
+        """
+        if not counts_df.empty:
+            part = join_weather(counts_df, self._weather, self.columns)
+            if self.columns is None:
+                self.columns = [col for col in part.columns if col in self._weather.columns
+                                and col not in counts_df.columns]
+            self._parts.append(part)
+            self._frame = None
+        return self
+
+    def update_weather(self, weather_df):
+        """
+        Adds weather rows (e.g. a newer export) and fills the count rows of hours without weather.
+        """
+        self._weather = pd.concat([self._weather, weather_df], ignore_index=True)
+        lookup = weather_lookup(self._weather)
+        parts = []
+        for part in self._parts:
+            missing = part[self.columns].isna().all(axis=1).to_numpy()
+            if missing.any():
+                positions = lookup.lookup(part['DATUM_TS'].to_numpy()[missing])
+                filled = take_weather_columns(self._weather, positions, self.columns)
+                # flache Kopie mit neuen Spalten-Arrays, der alte Teil bleibt unverändert
+                part = part.copy(deep=False)
+                for col in self.columns:
+                    values = part[col].array.copy()
+                    values[missing] = filled[col].array
+                    part[col] = values
+            parts.append(part)
+        self._parts = parts
+        self._frame = None
+        return self
+
+    @property
+    def frame(self):
+        if self._frame is None:
+            self._frame = self._parts[0] if len(self._parts) == 1 else (
+                pd.concat(self._parts) if self._parts else pd.DataFrame())
+        return self._frame
+
+    def __len__(self):
+        return sum(len(part) for part in self._parts)
+
+
+def weather_join(counts_df, weather_df, columns=None):
+    """
+    WeatherJoin of a counts frame with a weather frame, built once per (counts, weather, columns).
+
+    The entry keeps the weather frame alive as long as the counts frame lives, so its id stays unique.
+    """
+    joins = derived(counts_df, 'weather_joins', lambda _: {})
+    key = (id(weather_df), tuple(columns) if columns is not None else None)
+    if key not in joins:
+        joins[key] = WeatherJoin(counts_df, weather_df, columns)
+    return joins[key]
+
+
+def joined_weather(counts_df, weather_df, columns=None):
+    """
+    Counts joined with the weather (see weather_join), shared by the dashboard and sta.py.
+
+    The returned frame is shared, callers must not modify it.
+    """
+    return weather_join(counts_df, weather_df, columns).frame